@@ -4,21 +4,21 @@ Production-ready RAG backend with Llama 3.2 3B model, ChromaDB vector database,
 and comprehensive document processing
 """
 
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify, send_from_directory, Response, stream_with_context
 from flask_cors import CORS
 import os
 import json
 from datetime import datetime
 import traceback
+import itertools
 import threading
 import queue
 import time
-import uuid
 
 from config import Config
-from utils import ModelManager, DocumentProcessor, RAGEngine, PromptBuilder
-from chat_storage import ChatStorage
-from web_search import WebSearch, synthesize_web_results
+from utils import ModelManager, DocumentProcessor, RAGEngine, PromptBuilder, BatchingScheduler, RetrievalBatcher
+from chat_storage import create_chat_storage
+from web_search import get_web_search, synthesize_web_results
 
 # Initialize Flask app with frontend folder
 app = Flask(__name__, 
@@ -26,6 +26,14 @@ app = Flask(__name__,
             static_url_path='')
 CORS(app)
 
+# Compress responses (gzip/brotli) when the client supports it — chat and
+# research payloads are large text blobs that compress well
+try:
+    from flask_compress import Compress
+    Compress(app)
+except ImportError:
+    print("⚠️  Flask-Compress not installed — responses will be uncompressed")
+
 # Allow up to 50 MB uploads (Flask default is ~16 MB — would reject large files silently)
 app.config['MAX_CONTENT_LENGTH'] = Config.MAX_FILE_SIZE  # 50 * 1024 * 1024
 
@@ -36,15 +44,75 @@ Config.create_directories()
 model_manager = None
 rag_engine = None
 model_loaded = False
+batching_scheduler = None  # Coalesces concurrent generation requests into batches
+retrieval_batcher = None  # Coalesces concurrent semantic searches into batched retrievals
 chat_storage = None
 web_search = None
-worker_thread = None  # Track worker thread for graceful shutdown
+worker_threads = []  # Track worker threads for graceful shutdown
 shutdown_event = threading.Event()  # Signal to stop worker
 
+class StatusTracker:
+    """
+    Tracks per-file processing status with sharded locks.
+
+    Updates for different file_ids hash to different shards, so workers
+    reporting progress on separate files never contend on one global lock.
+    """
+
+    SHARD_COUNT = 16
+
+    def __init__(self):
+        self._shards = [{} for _ in range(self.SHARD_COUNT)]
+        self._locks = [threading.Lock() for _ in range(self.SHARD_COUNT)]
+
+    def _shard(self, file_id):
+        index = hash(file_id) % self.SHARD_COUNT
+        return self._shards[index], self._locks[index]
+
+    def set(self, file_id, status):
+        """Replace the status entry for a file"""
+        shard, lock = self._shard(file_id)
+        with lock:
+            shard[file_id] = status
+
+    def update(self, file_id, **fields):
+        """Update individual fields of an existing status entry"""
+        shard, lock = self._shard(file_id)
+        with lock:
+            if file_id in shard:
+                shard[file_id].update(fields)
+
+    def get(self, file_id):
+        """Get a copy of the status entry for a file"""
+        shard, lock = self._shard(file_id)
+        with lock:
+            status = shard.get(file_id)
+            return dict(status) if status else None
+
+    def snapshot(self):
+        """Get a copy of all status entries"""
+        result = {}
+        for shard, lock in zip(self._shards, self._locks):
+            with lock:
+                for file_id, status in shard.items():
+                    result[file_id] = dict(status)
+        return result
+
+
+# Upload id generation: process-startup timestamp prefix + monotonic counter.
+# Unique across restarts (prefix) and within a burst (counter), without the
+# RNG cost of uuid4 or the same-second collisions of int(time.time())
+_upload_id_prefix = format(time.time_ns() // 1_000_000, 'x')
+_upload_id_counter = itertools.count(1)
+
+def next_upload_id():
+    """Generate a cheap, monotonic, process-unique upload id"""
+    return f"{_upload_id_prefix}-{next(_upload_id_counter)}"
+
+
 # Processing queue and status tracking
 processing_queue = queue.Queue()
-processing_status = {}  # {file_id: {status, message, progress, etc.}}
-processing_lock = threading.Lock()
+processing_status = StatusTracker()  # {file_id: {status, message, progress, etc.}}
 
 # ============================================================================
 # UTILITY FUNCTIONS FOR INPUT VALIDATION AND SAFETY
@@ -102,9 +170,43 @@ def handle_error(error, error_type="Server error", is_verbose=False):
     
     return response, 500
 
+def generate_text(prompt, max_new_tokens=None, temperature=None):
+    """
+    Generate text through the batching scheduler when available.
+    Concurrent requests arriving within the batching window share a single
+    forward pass instead of serializing on the GPU.
+    """
+    if batching_scheduler and batching_scheduler.is_running():
+        future = batching_scheduler.submit(
+            prompt,
+            max_new_tokens=max_new_tokens,
+            temperature=temperature
+        )
+        return future.result()
+
+    # Fallback: direct generation (scheduler not started yet)
+    return model_manager.generate(
+        prompt,
+        max_new_tokens=max_new_tokens,
+        temperature=temperature
+    )
+
+
+def retrieve_documents(query, top_k=None, session_id=None):
+    """
+    Semantic search through the retrieval batcher when available, so
+    concurrent searches share one embedding encode and vector-db query.
+    """
+    if retrieval_batcher and retrieval_batcher.is_running():
+        future = retrieval_batcher.submit(query, top_k=top_k, session_id=session_id)
+        return future.result()
+
+    return rag_engine.semantic_search(query, top_k=top_k, session_id=session_id)
+
+
 def initialize_backend():
     """Initialize model and RAG engine in background thread"""
-    global model_manager, rag_engine, model_loaded
+    global model_manager, rag_engine, model_loaded, batching_scheduler
     
     print("\n" + "="*70)
     print(" LUMINA RAG BACKEND - INITIALIZATION")
@@ -125,6 +227,10 @@ def initialize_backend():
         print("📡 Server will start immediately and model will load in background...\n")
         model_manager.load_model()
         model_loaded = True
+
+        # Start the request batching scheduler now that the model is ready
+        batching_scheduler = BatchingScheduler(model_manager)
+        batching_scheduler.start()
         
         print("\n" + "="*70)
         print(" ✓ MODEL LOADED SUCCESSFULLY")
@@ -138,11 +244,116 @@ def initialize_backend():
         model_loaded = False
 
 
+# How many queued files one worker drains into a single bulk ingest —
+# bounded so status updates stay responsive during huge multi-file uploads
+INGEST_BATCH_SIZE = 8
+
+
+def _mark_task_failed(file_id, filename, error_msg):
+    """Record a failed processing status for one queued file"""
+    processing_status.set(file_id, {
+        'status': 'failed',
+        'message': f'Processing failed: {error_msg}',
+        'progress': 0,
+        'filename': filename,
+        'error': error_msg,
+        'updated_at': datetime.now().isoformat()
+    })
+
+
+def _ingest_document_batch(tasks):
+    """Extract text for a drained batch of upload tasks, then index each
+    session's files through one add_documents_bulk call — every file in
+    the batch shares a single GPU embedding encode."""
+    extracted = []  # (task, processed) pairs that survived extraction
+    for task in tasks:
+        file_id = task['file_id']
+        filename = task['filename']
+
+        print(f"\n📄 Processing queued file: {filename} (ID: {file_id})")
+
+        # Update status: processing
+        processing_status.set(file_id, {
+            'status': 'processing',
+            'message': 'Extracting text from document...',
+            'progress': 30,
+            'filename': filename,
+            'updated_at': datetime.now().isoformat()
+        })
+
+        try:
+            processed = DocumentProcessor.process_document(task['filepath'])
+            if not processed['success']:
+                raise Exception('Failed to extract text from document')
+        except Exception as e:
+            error_msg = str(e)
+            print(f"❌ Error processing {filename}: {error_msg}")
+            traceback.print_exc()
+            _mark_task_failed(file_id, filename, error_msg)
+            continue
+
+        # Update status: indexing
+        processing_status.update(
+            file_id,
+            status='indexing',
+            message='Adding to knowledge base...',
+            progress=70,
+            updated_at=datetime.now().isoformat()
+        )
+        extracted.append((task, processed))
+
+    # Group by session — add_documents_bulk indexes one session scope per
+    # call; each group still amortizes chunking + encoding across its files
+    by_session = {}
+    for task, processed in extracted:
+        by_session.setdefault(task.get('session_id'), []).append((task, processed))
+
+    for session_id, items in by_session.items():
+        files = [
+            (
+                task['filename'],
+                processed['text'],
+                {
+                    'file_type': processed['file_type'],
+                    'extension': processed['extension'],
+                    'word_count': processed['word_count'],
+                    'file_id': task['file_id']
+                }
+            )
+            for task, processed in items
+        ]
+        try:
+            counts = rag_engine.add_documents_bulk(files, session_id=session_id)
+        except Exception as e:
+            error_msg = str(e)
+            print(f"❌ Error indexing batch ({len(items)} file(s)): {error_msg}")
+            traceback.print_exc()
+            for task, _ in items:
+                _mark_task_failed(task['file_id'], task['filename'], error_msg)
+            continue
+
+        for (task, processed), chunks_added in zip(items, counts):
+            # Update status: completed
+            processing_status.set(task['file_id'], {
+                'status': 'completed',
+                'message': 'Document indexed successfully',
+                'progress': 100,
+                'filename': task['filename'],
+                'chunks_added': chunks_added,
+                'word_count': processed['word_count'],
+                'file_type': processed['file_type'],
+                'completed_at': datetime.now().isoformat(),
+                'updated_at': datetime.now().isoformat()
+            })
+            print(f"✓ Completed processing: {task['filename']} ({chunks_added} chunks added)")
+
+
 def process_documents_worker():
     """Background worker to process documents from the queue"""
     print("📋 Document processing worker started")
-    
-    while not shutdown_event.is_set():
+
+    stop = False
+    while not shutdown_event.is_set() and not stop:
         try:
             # Get next document from queue (blocking with timeout)
             try:
@@ -150,94 +361,34 @@ def process_documents_worker():
             except queue.Empty:
                 # Timeout waiting for task - check shutdown event again
                 continue
-            
+
             if task is None:  # Poison pill to stop worker
                 break
-            
-            file_id = task['file_id']
-            filepath = task['filepath']
-            filename = task['filename']
-            session_id = task.get('session_id')
-            
-            print(f"\n📄 Processing queued file: {filename} (ID: {file_id})")
-            
-            # Update status: processing
-            with processing_lock:
-                processing_status[file_id] = {
-                    'status': 'processing',
-                    'message': 'Extracting text from document...',
-                    'progress': 30,
-                    'filename': filename,
-                    'updated_at': datetime.now().isoformat()
-                }
-            
+
+            # Drain whatever else is already queued (bounded) so a
+            # multi-file upload is indexed in one bulk call
+            tasks = [task]
+            while len(tasks) < INGEST_BATCH_SIZE:
+                try:
+                    extra = processing_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if extra is None:  # Finish this batch, then stop
+                    stop = True
+                    break
+                tasks.append(extra)
+
             try:
-                # Process document
-                processed = DocumentProcessor.process_document(filepath)
-                
-                if not processed['success']:
-                    raise Exception('Failed to extract text from document')
-                
-                # Update status: indexing
-                with processing_lock:
-                    processing_status[file_id]['status'] = 'indexing'
-                    processing_status[file_id]['message'] = 'Adding to knowledge base...'
-                    processing_status[file_id]['progress'] = 70
-                    processing_status[file_id]['updated_at'] = datetime.now().isoformat()
-                
-                # Add to RAG engine with session_id
-                chunks_added = rag_engine.add_document(
-                    filename=filename,
-                    text=processed['text'],
-                    metadata={
-                        'file_type': processed['file_type'],
-                        'extension': processed['extension'],
-                        'word_count': processed['word_count'],
-                        'file_id': file_id
-                    },
-                    session_id=session_id
-                )
-                
-                # Update status: completed
-                with processing_lock:
-                    processing_status[file_id] = {
-                        'status': 'completed',
-                        'message': 'Document indexed successfully',
-                        'progress': 100,
-                        'filename': filename,
-                        'chunks_added': chunks_added,
-                        'word_count': processed['word_count'],
-                        'file_type': processed['file_type'],
-                        'completed_at': datetime.now().isoformat(),
-                        'updated_at': datetime.now().isoformat()
-                    }
-                
-                print(f"✓ Completed processing: {filename} ({chunks_added} chunks added)")
-                
-            except Exception as e:
-                # Update status: failed
-                error_msg = str(e)
-                print(f"❌ Error processing {filename}: {error_msg}")
-                traceback.print_exc()
-                
-                with processing_lock:
-                    processing_status[file_id] = {
-                        'status': 'failed',
-                        'message': f'Processing failed: {error_msg}',
-                        'progress': 0,
-                        'filename': filename,
-                        'error': error_msg,
-                        'updated_at': datetime.now().isoformat()
-                    }
-            
+                _ingest_document_batch(tasks)
             finally:
-                processing_queue.task_done()
-                
+                for _ in tasks:
+                    processing_queue.task_done()
+
         except Exception as e:
             print(f"❌ Worker error: {str(e)}")
             traceback.print_exc()
             time.sleep(1)  # Prevent tight loop on errors
-    
+
     # Graceful shutdown
     print("🛑 Document processing worker shutting down...")
 
@@ -278,6 +429,12 @@ def shutdown():
     global shutdown_event
     print("🛑 Shutdown request received...")
     shutdown_event.set()  # Signal worker to stop
+    if batching_scheduler:
+        batching_scheduler.shutdown()
+    if retrieval_batcher:
+        retrieval_batcher.shutdown()
+    if chat_storage:
+        chat_storage.close()  # Flush write-behind saves before exit
     return jsonify({'message': 'Server shutting down...'}), 200
 
 
@@ -369,9 +526,9 @@ def chat():
         if not context_docs and use_rag and mode_settings.get('use_rag', False):
             top_k = mode_settings.get('top_k', 3)
             if top_k > 0:
-                context_docs = rag_engine.semantic_search(message, top_k=top_k, session_id=session_id)
+                context_docs = retrieve_documents(message, top_k=top_k, session_id=session_id)
                 if not context_docs:
-                    context_docs = rag_engine.semantic_search(message, top_k=top_k)
+                    context_docs = retrieve_documents(message, top_k=top_k)
                 print(f"📚 TIER3: Semantic search retrieved {len(context_docs)} documents")
         
         # Build enhanced message that tells the model about the uploaded files
@@ -392,9 +549,41 @@ def chat():
             conversation_history=conversation_history
         )
         
+        # Streaming mode: send tokens over SSE as they are generated so
+        # time-to-first-token is a single forward pass, not the full decode
+        if data.get('stream'):
+            context_sources = [
+                {
+                    'filename': doc['metadata'].get('filename'),
+                    'similarity': doc.get('similarity')
+                }
+                for doc in context_docs[:3]
+            ] if context_docs else []
+
+            def stream_tokens():
+                print(f"💭 Streaming response in '{mode}' mode...")
+                try:
+                    for token_text in model_manager.generate_stream(
+                        prompt,
+                        max_new_tokens=mode_settings.get('max_tokens', 1024),
+                        temperature=mode_settings.get('temperature', 0.7)
+                    ):
+                        yield f"data: {json.dumps({'token': token_text})}\n\n"
+                    yield f"data: {json.dumps({'done': True, 'mode': mode, 'context_sources': context_sources})}\n\n"
+                except Exception as stream_err:
+                    print(f"❌ Streaming error: {str(stream_err)}")
+                    traceback.print_exc()
+                    yield f"data: {json.dumps({'error': 'Generation failed'})}\n\n"
+
+            return Response(
+                stream_with_context(stream_tokens()),
+                mimetype='text/event-stream',
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+            )
+
         # Generate response
         print(f"💭 Generating response in '{mode}' mode...")
-        response_text = model_manager.generate(
+        response_text = generate_text(
             prompt,
             max_new_tokens=mode_settings.get('max_tokens', 1024),
             temperature=mode_settings.get('temperature', 0.7)
@@ -447,7 +636,7 @@ def summarize():
         
         prompt = PromptBuilder.build_summarize_prompt(text)
         
-        response_text = model_manager.generate(
+        response_text = generate_text(
             prompt,
             max_new_tokens=512,
             temperature=0.3
@@ -489,19 +678,30 @@ def deep_research():
         if not query:
             return jsonify({'error': 'Query is required'}), 400
         
-        # Phase 1: Web Search (if available)
+        # Phase 1+2: Web Search and RAG Retrieval in parallel — the web call
+        # is network-bound and the retrieval is GPU/db-bound, so overlapping
+        # them cuts the pre-synthesis latency to the slower of the two
+        from concurrent.futures import ThreadPoolExecutor
+
         web_results = []
-        if web_search and web_search.is_available():
-            print(f"🌐 Performing web search for: {query}")
-            web_results = web_search.search_web(query, max_results=5)
-        else:
-            print("⚠️ Web search not available (API key not configured)")
-        
-        # Phase 2: RAG Retrieval
         rag_docs = []
-        if rag_engine.collection.count() > 0:
-            rag_docs = rag_engine.semantic_search(query, top_k=10, session_id=session_id)
-            print(f"📚 Retrieved {len(rag_docs)} documents from knowledge base (session: {session_id or 'global'})")
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            web_future = None
+            if web_search and web_search.is_available():
+                print(f"🌐 Performing web search for: {query}")
+                web_future = executor.submit(web_search.search_web, query, 5)
+            else:
+                print("⚠️ Web search not available (API key not configured)")
+
+            rag_future = None
+            if rag_engine.collection.count() > 0:
+                rag_future = executor.submit(retrieve_documents, query, 10, session_id)
+
+            if web_future:
+                web_results = web_future.result()
+            if rag_future:
+                rag_docs = rag_future.result()
+                print(f"📚 Retrieved {len(rag_docs)} documents from knowledge base (session: {session_id or 'global'})")
         
         # Phase 3: Synthesize answer
         if web_results or rag_docs:
@@ -511,7 +711,7 @@ def deep_research():
             # Fallback: just use model without context
             print("⚠️ No web or RAG results, using model alone")
             prompt = f"Provide a comprehensive answer to this research query:\n\n{query}"
-            response_text = model_manager.generate(
+            response_text = generate_text(
                 prompt,
                 max_new_tokens=2048,
                 temperature=0.6
@@ -577,11 +777,11 @@ def code_assist():
             return jsonify({'error': 'Message is required'}), 400
         
         # Search for relevant code context
-        context_docs = rag_engine.semantic_search(message, top_k=3, session_id=data.get('session_id'))
+        context_docs = retrieve_documents(message, top_k=3, session_id=data.get('session_id'))
         
         prompt = PromptBuilder.build_coding_prompt(message, context_docs)
         
-        response_text = model_manager.generate(
+        response_text = generate_text(
             prompt,
             max_new_tokens=1536,
             temperature=0.2
@@ -628,13 +828,14 @@ def upload_file():
             return jsonify({'error': 'Invalid filename'}), 400
         
         # Generate unique file ID
-        file_id = str(uuid.uuid4())
-        
+        file_id = next_upload_id()
+
         # Save file immediately — into session subdirectory if session_id provided
         filename = file.filename
-        # Add timestamp to filename to avoid collisions
+        # Suffix with the upload id to avoid collisions (int(time.time())
+        # collided for same-named files uploaded within one second)
         base_name, ext = os.path.splitext(safe_basename)
-        safe_filename = f"{base_name}_{int(time.time())}{ext}"
+        safe_filename = f"{base_name}_{file_id}{ext}"
         
         if session_id:
             # Validate session_id format
@@ -652,7 +853,9 @@ def upload_file():
         if not real_filepath.startswith(real_upload_dir):
             return jsonify({'error': 'Invalid file path'}), 400
         
-        file.save(filepath)
+        # 1 MB copy buffer — default 16 KB makes 50 MB uploads thousands of
+        # tiny read/write syscalls
+        file.save(filepath, buffer_size=1024 * 1024)
         print(f"✓ File saved: {safe_filename} (session: {session_id or 'global'})")
         
         # Check file size after saving
@@ -669,17 +872,16 @@ def upload_file():
             }), 413  # Use 413 Payload Too Large HTTP status
         
         # Set initial status
-        with processing_lock:
-            processing_status[file_id] = {
-                'status': 'queued',
-                'message': 'File uploaded, waiting to be processed...',
-                'progress': 10,
-                'filename': filename,
-                'safe_filename': safe_filename,
-                'session_id': session_id,
-                'uploaded_at': datetime.now().isoformat(),
-                'updated_at': datetime.now().isoformat()
-            }
+        processing_status.set(file_id, {
+            'status': 'queued',
+            'message': 'File uploaded, waiting to be processed...',
+            'progress': 10,
+            'filename': filename,
+            'safe_filename': safe_filename,
+            'session_id': session_id,
+            'uploaded_at': datetime.now().isoformat(),
+            'updated_at': datetime.now().isoformat()
+        })
         
         # Queue for processing — include session_id
         processing_queue.put({
@@ -712,9 +914,8 @@ def get_upload_status(file_id):
     Get processing status for an uploaded file
     """
     try:
-        with processing_lock:
-            status = processing_status.get(file_id)
-        
+        status = processing_status.get(file_id)
+
         if not status:
             return jsonify({'error': 'File ID not found'}), 404
         
@@ -731,9 +932,8 @@ def get_all_upload_status():
     Get processing status for all uploads
     """
     try:
-        with processing_lock:
-            all_status = dict(processing_status)
-        
+        all_status = processing_status.snapshot()
+
         return jsonify({
             'uploads': all_status,
             'count': len(all_status),
@@ -795,7 +995,7 @@ def search_documents():
         if not query:
             return jsonify({'error': 'Query is required'}), 400
         
-        results = rag_engine.semantic_search(query, top_k=top_k, session_id=session_id)
+        results = retrieve_documents(query, top_k=top_k, session_id=session_id)
         
         return jsonify({
             'query': query,
@@ -903,12 +1103,12 @@ def delete_chat_endpoint(chat_id):
 if __name__ == '__main__':
     # Initialize Chat Storage
     print("💾 Initializing Chat Storage...")
-    chat_storage = ChatStorage(Config.CHAT_HISTORY_DIR)
+    chat_storage = create_chat_storage(Config.CHAT_HISTORY_DIR)
     print("✓ Chat Storage ready\n")
     
     # Initialize Web Search
     print("🔍 Initializing Web Search...")
-    web_search = WebSearch()
+    web_search = get_web_search()
     if web_search.is_available():
         print("✓ Web Search ready (API key configured)\n")
     else:
@@ -918,12 +1118,19 @@ if __name__ == '__main__':
     print("📚 Initializing RAG Engine...")
     rag_engine = RAGEngine()
     print("✓ RAG Engine ready\n")
-    
-    # Start document processing worker in background thread
-    print("📋 Starting document processing worker...")
-    worker_thread = threading.Thread(target=process_documents_worker, daemon=True)
-    worker_thread.start()
-    print("✓ Document processing worker ready\n")
+
+    # Start retrieval batcher so concurrent searches share batched encodes
+    retrieval_batcher = RetrievalBatcher(rag_engine)
+    retrieval_batcher.start()
+
+    # Start document processing worker pool so multiple uploads
+    # extract/index in parallel instead of queueing behind each other
+    print(f"📋 Starting {Config.DOC_WORKER_COUNT} document processing worker(s)...")
+    for _ in range(Config.DOC_WORKER_COUNT):
+        worker = threading.Thread(target=process_documents_worker, daemon=True)
+        worker.start()
+        worker_threads.append(worker)
+    print("✓ Document processing workers ready\n")
     
     # Start model loading in background thread
     print("🚀 Starting model loading in background thread...")
@@ -940,8 +1147,25 @@ if __name__ == '__main__':
     print(" 📋 File uploads will be processed asynchronously")
     print("="*70 + "\n")
     
-    app.run(
-        host=Config.FLASK_HOST,
-        port=Config.FLASK_PORT,
-        debug=Config.FLASK_DEBUG
-    )
+    # Serve with waitress (production WSGI, multi-threaded) when available;
+    # the Flask dev server is single-process and logs every request
+    serve = None
+    if not Config.FLASK_DEBUG:
+        try:
+            from waitress import serve
+        except ImportError:
+            print("⚠️  waitress not installed — falling back to Flask dev server")
+
+    if serve is not None:
+        serve(
+            app,
+            host=Config.FLASK_HOST,
+            port=Config.FLASK_PORT,
+            threads=Config.WSGI_THREADS
+        )
+    else:
+        app.run(
+            host=Config.FLASK_HOST,
+            port=Config.FLASK_PORT,
+            debug=Config.FLASK_DEBUG
+        )
@@ -3,51 +3,331 @@ Chat Storage Module
 Handles persistent storage of chat conversations as JSON files
 """
 
+import atexit
 import os
 import json
+import mmap
+import re
+import sqlite3
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Dict, List, Optional
 import traceback
 
+# orjson parses/serializes several times faster than stdlib json; fall back
+# transparently when it is not installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _json_loads(data):
+    """Parse JSON from str, bytes, or a buffer with the fastest available backend"""
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    if isinstance(data, bytes):
+        data = data.decode('utf-8')
+    return json.loads(data)
+
+
+def _json_dumps(obj, pretty: bool = False) -> bytes:
+    """Serialize to UTF-8 bytes with the fastest available backend"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else 0)
+    return json.dumps(obj, indent=2 if pretty else None, ensure_ascii=False).encode('utf-8')
+
+
+# Files at or above this size are parsed through mmap, letting the parser
+# read pages straight from the page cache without an intermediate copy
+_MMAP_THRESHOLD = 16 * 1024
+
+
+def _read_json_file(filepath):
+    """Read and parse a JSON file, memory-mapping large ones"""
+    with open(filepath, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size >= _MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return _json_loads(memoryview(mm))
+        return _json_loads(f.read())
+
+
+# Top-level metadata fields pulled out without a full parse — the
+# messages array holds nearly all the bytes in a chat file
+_TITLE_RE = re.compile(rb'"title"\s*:\s*"([^"\\]*)"')
+_CREATED_RE = re.compile(rb'"created_at"\s*:\s*"([^"\\]*)"')
+_UPDATED_RE = re.compile(rb'"updated_at"\s*:\s*"([^"\\]*)"')
+_ID_RE = re.compile(rb'"id"\s*:\s*"([^"\\]*)"')
+
+
+def _scan_metadata(buf: bytes):
+    """Extract listing metadata from raw chat bytes without parsing the
+    message bodies. Returns (chat_id, entry) or None when the structural
+    scan cannot find the fields (caller falls back to a full parse)."""
+    title = _TITLE_RE.search(buf)
+    created = _CREATED_RE.search(buf)
+    updated = _UPDATED_RE.search(buf)
+    if title is None or created is None or updated is None:
+        return None
+    chat_id = _ID_RE.search(buf)
+    entry = {
+        'title': title.group(1).decode('utf-8', errors='replace'),
+        'created_at': created.group(1).decode('utf-8'),
+        'updated_at': updated.group(1).decode('utf-8'),
+        'message_count': buf.count(b'"role":'),
+    }
+    return (chat_id.group(1).decode('utf-8') if chat_id else None, entry)
+
+
+def _atomic_write(filepath, data: bytes):
+    """Write bytes to a temp file, fsync, then rename into place.
+
+    mkstemp gives every writer its own temp file, so concurrent writers
+    on different threads never interleave bytes in a shared .tmp file.
+    The rename is atomic, so readers always see either the previous
+    complete file or the new one — never a truncated document that would
+    throw listing and load paths into their exception handlers.
+    """
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(filepath) or '.',
+        prefix=os.path.basename(filepath) + '.tmp.'
+    )
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
 class ChatStorage:
     """Manages chat persistence using file-based JSON storage"""
-    
+
+    # How long the writer waits to coalesce rapid saves of the same chat
+    WRITE_BEHIND_INTERVAL = 0.2
+
+    # Hot chats served from memory — the active conversation is re-loaded
+    # on almost every frontend interaction
+    CHAT_CACHE_SIZE = 32
+
     def __init__(self, storage_dir: str = "./chat_history"):
         self.storage_dir = storage_dir
         os.makedirs(storage_dir, exist_ok=True)
-    
+
+        # Metadata index: one small file holding {chat_id: metadata} so
+        # listing chats never re-parses every chat JSON on disk
+        self._index_path = os.path.join(storage_dir, "_index.json")
+        self._index_lock = threading.Lock()
+        self._index = self._load_index()
+
+        # LRU cache of recently loaded/saved chats
+        self._chat_cache: "OrderedDict[str, Dict]" = OrderedDict()
+        self._chat_cache_lock = threading.Lock()
+
+        # Write-behind state: saves land here and a background writer flushes
+        # them off the request thread. Latest data per chat id wins, so rapid
+        # re-saves of the same conversation collapse into one disk write.
+        self._pending: Dict[str, Dict] = {}
+        self._pending_lock = threading.Lock()
+        # Serializes whole flushes: the writer thread and request-path
+        # flushes (listing, close) otherwise overlap, and a batch drained
+        # earlier could write over a chat's newer save from a later batch
+        self._flush_lock = threading.Lock()
+        self._pending_event = threading.Event()
+        self._shutdown = threading.Event()
+        self._writer_thread = threading.Thread(target=self._writer_loop, daemon=True)
+        self._writer_thread.start()
+        # Safety net for exits that never hit the shutdown endpoint
+        atexit.register(self.close)
+
+    def _writer_loop(self):
+        """Background writer: drain pending saves in batches"""
+        while not self._shutdown.is_set():
+            self._pending_event.wait(timeout=1)
+            if not self._pending_event.is_set():
+                continue
+            # Small window lets bursts of saves coalesce before flushing
+            self._shutdown.wait(self.WRITE_BEHIND_INTERVAL)
+            self._pending_event.clear()
+            self._flush_pending()
+
+    def _flush_pending(self):
+        """Write all pending chats to disk and update the index once.
+
+        Draining and writing under one lock keeps flushes ordered: the
+        batch holding a chat's newest save is always written last.
+        """
+        with self._flush_lock:
+            with self._pending_lock:
+                batch = self._pending
+                self._pending = {}
+
+            indexed = False
+            for chat_id, chat_data in batch.items():
+                if self._write_chat_file(chat_id, chat_data):
+                    self._update_index_entry(chat_id, chat_data)
+                    indexed = True
+
+            if indexed:
+                self._save_index()
+
+    def close(self):
+        """Stop the background writer after a final flush.
+
+        Saves accepted inside the coalescing window would otherwise be
+        lost when the process exits — the writer thread is a daemon.
+        Idempotent, so the shutdown endpoint and atexit can both call it.
+        """
+        if self._shutdown.is_set():
+            return
+        self._shutdown.set()
+        self._pending_event.set()
+        self._writer_thread.join(timeout=5)
+        self._flush_pending()
+
+    # -------------------------------------------------------------------------
+    # Metadata index
+    # -------------------------------------------------------------------------
+
+    @staticmethod
+    def _index_entry(chat_data: Dict) -> Dict:
+        """Extract the listing metadata for one chat"""
+        return {
+            'title': chat_data.get('title', 'Untitled Chat'),
+            'created_at': chat_data.get('created_at'),
+            'updated_at': chat_data.get('updated_at'),
+            'message_count': len(chat_data.get('messages', []))
+        }
+
+    def _update_index_entry(self, chat_id: str, chat_data: Dict):
+        """Update the in-memory index for one chat (caller saves)"""
+        with self._index_lock:
+            self._index[chat_id] = self._index_entry(chat_data)
+
+    def _save_index(self):
+        """Persist the metadata index"""
+        try:
+            with self._index_lock:
+                serialized = _json_dumps(self._index)
+            _atomic_write(self._index_path, serialized)
+        except Exception as e:
+            print(f"⚠️ Error saving chat index: {str(e)}")
+
+    def _load_index(self) -> Dict:
+        """Load the metadata index, rebuilding it from chat files if missing"""
+        try:
+            return _read_json_file(self._index_path)
+        except FileNotFoundError:
+            return self._rebuild_index()
+        except Exception as e:
+            print(f"⚠️ Chat index unreadable ({str(e)}) — rebuilding")
+            return self._rebuild_index()
+
+    def _rebuild_index(self) -> Dict:
+        """One-time scan of existing chat files to build the index"""
+        index = {}
+        try:
+            # scandir yields name, path, and cached stat in one syscall batch
+            # (listdir + per-file os.path.join/stat does extra work per entry)
+            with os.scandir(self.storage_dir) as entries:
+                for entry in entries:
+                    filename = entry.name
+                    if filename.startswith("chat_") and filename.endswith(".json") and entry.is_file():
+                        try:
+                            with open(entry.path, 'rb') as f:
+                                buf = f.read()
+                            # Structural scan reads only the metadata fields;
+                            # the messages array — nearly all the bytes — is
+                            # never parsed. Full parse is the fallback.
+                            scanned = _scan_metadata(buf)
+                            if scanned is not None:
+                                chat_id, meta = scanned
+                                chat_id = chat_id or filename[len("chat_"):-len(".json")]
+                                index[chat_id] = meta
+                            else:
+                                chat_data = _json_loads(buf)
+                                chat_id = chat_data.get('id') or filename[len("chat_"):-len(".json")]
+                                index[chat_id] = self._index_entry(chat_data)
+                        except Exception as e:
+                            print(f"⚠️ Error indexing chat file {filename}: {str(e)}")
+                            continue
+        except Exception as e:
+            print(f"⚠️ Error rebuilding chat index: {str(e)}")
+
+        if index:
+            print(f"✓ Rebuilt chat index ({len(index)} chats)")
+        return index
+
+    def _cache_chat(self, chat_id: str, chat_data: Dict):
+        """Insert/refresh a chat in the LRU cache, evicting the oldest entry"""
+        with self._chat_cache_lock:
+            self._chat_cache[chat_id] = chat_data
+            self._chat_cache.move_to_end(chat_id)
+            while len(self._chat_cache) > self.CHAT_CACHE_SIZE:
+                self._chat_cache.popitem(last=False)
+
     def _get_chat_filepath(self, chat_id: str) -> str:
         """Get filepath for a chat ID"""
         return os.path.join(self.storage_dir, f"chat_{chat_id}.json")
     
+    def _write_chat_file(self, chat_id: str, chat_data: Dict) -> bool:
+        """Write a single chat to disk"""
+        try:
+            filepath = self._get_chat_filepath(chat_id)
+
+            # Serialize once and write in a single call — json.dump streams
+            # many small writes through the text wrapper
+            serialized = _json_dumps(chat_data, pretty=True)
+            _atomic_write(filepath, serialized)
+
+            return True
+
+        except Exception as e:
+            print(f"❌ Error saving chat {chat_id}: {str(e)}")
+            traceback.print_exc()
+            return False
+
     def save_chat(self, chat_id: str, chat_data: Dict) -> bool:
         """
-        Save or update a chat to disk
-        
+        Save or update a chat (write-behind: queued for the background
+        writer so the request thread never blocks on disk)
+
         Args:
             chat_id: Unique chat identifier
             chat_data: Chat data including messages, title, etc.
-            
+
         Returns:
-            True if successful, False otherwise
+            True if accepted for writing, False otherwise
         """
         try:
-            filepath = self._get_chat_filepath(chat_id)
-            
             # Add timestamps
             if 'created_at' not in chat_data:
                 chat_data['created_at'] = datetime.now().isoformat()
             chat_data['updated_at'] = datetime.now().isoformat()
             chat_data['id'] = chat_id
-            
-            # Write to file with pretty formatting
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(chat_data, f, indent=2, ensure_ascii=False)
-            
+
+            self._cache_chat(chat_id, chat_data)
+
+            with self._pending_lock:
+                self._pending[chat_id] = chat_data  # Latest save wins
+            self._pending_event.set()
+
             return True
-            
+
         except Exception as e:
-            print(f"❌ Error saving chat {chat_id}: {str(e)}")
+            print(f"❌ Error queueing chat {chat_id}: {str(e)}")
             traceback.print_exc()
             return False
     
@@ -62,14 +342,28 @@ class ChatStorage:
             Chat data dict or None if not found
         """
         try:
+            # Read-your-writes: a save may still be sitting in the
+            # write-behind queue
+            with self._pending_lock:
+                pending = self._pending.get(chat_id)
+            if pending is not None:
+                return pending
+
+            # Hot chats are served straight from memory
+            with self._chat_cache_lock:
+                cached = self._chat_cache.get(chat_id)
+                if cached is not None:
+                    self._chat_cache.move_to_end(chat_id)
+                    return cached
+
             filepath = self._get_chat_filepath(chat_id)
-            
+
             if not os.path.exists(filepath):
                 return None
-            
-            with open(filepath, 'r', encoding='utf-8') as f:
-                chat_data = json.load(f)
-            
+
+            chat_data = _read_json_file(filepath)
+            self._cache_chat(chat_id, chat_data)
+
             return chat_data
             
         except Exception as e:
@@ -88,11 +382,24 @@ class ChatStorage:
             True if deleted, False if not found or error
         """
         try:
+            # Drop any queued save so the writer cannot resurrect the chat
+            with self._pending_lock:
+                was_pending = self._pending.pop(chat_id, None) is not None
+
+            with self._chat_cache_lock:
+                self._chat_cache.pop(chat_id, None)
+
+            # Remove from the metadata index
+            with self._index_lock:
+                removed = self._index.pop(chat_id, None) is not None
+            if removed:
+                self._save_index()
+
             filepath = self._get_chat_filepath(chat_id)
-            
+
             if not os.path.exists(filepath):
-                return False
-            
+                return was_pending
+
             os.remove(filepath)
             print(f"✓ Deleted chat: {chat_id}")
             return True
@@ -110,34 +417,16 @@ class ChatStorage:
             List of chat metadata dicts (id, title, created_at, updated_at)
         """
         try:
-            chats = []
-            
-            # List all chat files
-            if not os.path.exists(self.storage_dir):
-                return []
-            
-            for filename in os.listdir(self.storage_dir):
-                if filename.startswith("chat_") and filename.endswith(".json"):
-                    try:
-                        filepath = os.path.join(self.storage_dir, filename)
-                        with open(filepath, 'r', encoding='utf-8') as f:
-                            chat_data = json.load(f)
-                        
-                        # Extract metadata
-                        chats.append({
-                            'id': chat_data.get('id'),
-                            'title': chat_data.get('title', 'Untitled Chat'),
-                            'created_at': chat_data.get('created_at'),
-                            'updated_at': chat_data.get('updated_at'),
-                            'message_count': len(chat_data.get('messages', []))
-                        })
-                    except Exception as e:
-                        print(f"⚠️ Error reading chat file {filename}: {str(e)}")
-                        continue
-            
+            # Flush queued saves so the listing reflects them
+            self._flush_pending()
+
+            # Serve from the metadata index — no per-file JSON parsing
+            with self._index_lock:
+                chats = [dict(meta, id=chat_id) for chat_id, meta in self._index.items()]
+
             # Sort by updated_at (most recent first)
-            chats.sort(key=lambda x: x.get('updated_at', ''), reverse=True)
-            
+            chats.sort(key=lambda x: x.get('updated_at') or '', reverse=True)
+
             return chats
             
         except Exception as e:
@@ -153,29 +442,230 @@ class ChatStorage:
             List of complete chat data dicts
         """
         try:
+            # Flush queued saves so the listing reflects them
+            self._flush_pending()
+
             chats = []
-            
+
             # List all chat files
             if not os.path.exists(self.storage_dir):
                 return []
-            
-            for filename in os.listdir(self.storage_dir):
-                if filename.startswith("chat_") and filename.endswith(".json"):
-                    try:
-                        filepath = os.path.join(self.storage_dir, filename)
-                        with open(filepath, 'r', encoding='utf-8') as f:
-                            chat_data = json.load(f)
-                        chats.append(chat_data)
-                    except Exception as e:
-                        print(f"⚠️ Error reading chat file {filename}: {str(e)}")
-                        continue
+
+            # scandir avoids the extra join + stat round trip per entry
+            with os.scandir(self.storage_dir) as entries:
+                paths = [
+                    entry.path for entry in entries
+                    if entry.name.startswith("chat_") and entry.name.endswith(".json")
+                    and entry.is_file()
+                ]
+
+            def _load_one(path):
+                try:
+                    return _read_json_file(path)
+                except Exception as e:
+                    print(f"⚠️ Error reading chat file {os.path.basename(path)}: {str(e)}")
+                    return None
+
+            # Load files with a small thread pool — parsing holds the GIL
+            # (orjson included), so the threads only overlap the file reads;
+            # 4 workers is enough to hide cold-cache disk latency without
+            # piling up contention on the parse side
+            if len(paths) > 4:
+                with ThreadPoolExecutor(max_workers=4) as executor:
+                    chats = [chat for chat in executor.map(_load_one, paths) if chat]
+            else:
+                chats = [chat for chat in map(_load_one, paths) if chat]
             
             # Sort by updated_at (most recent first)
             chats.sort(key=lambda x: x.get('updated_at', ''), reverse=True)
-            
+
             return chats
-            
+
+        except Exception as e:
+            print(f"❌ Error loading all chats: {str(e)}")
+            traceback.print_exc()
+            return []
+
+
+class SQLiteChatStorage:
+    """Chat persistence backed by a single SQLite database.
+
+    One row per chat replaces one file per chat: listing becomes an
+    indexed query over metadata columns instead of a directory scan, and
+    WAL mode lets readers proceed while a save is in flight. The full
+    chat document is stored as a JSON blob alongside the metadata.
+    """
+
+    def __init__(self, storage_dir: str = "./chat_history"):
+        self.storage_dir = storage_dir
+        os.makedirs(storage_dir, exist_ok=True)
+
+        self._db_path = os.path.join(storage_dir, "chats.sqlite")
+        existed = os.path.exists(self._db_path)
+
+        # sqlite3 objects are not thread-safe by default; a single shared
+        # connection behind a lock is plenty for the chat endpoints
+        self._conn = sqlite3.connect(self._db_path, check_same_thread=False)
+        self._conn_lock = threading.Lock()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS chats (
+                id TEXT PRIMARY KEY,
+                title TEXT,
+                created_at TEXT,
+                updated_at TEXT,
+                message_count INTEGER,
+                data BLOB
+            )"""
+        )
+        self._conn.commit()
+
+        if not existed:
+            self._import_json_chats()
+
+    def _import_json_chats(self):
+        """One-time import of existing chat_*.json files into the database"""
+        imported = 0
+        try:
+            with os.scandir(self.storage_dir) as entries:
+                for entry in entries:
+                    name = entry.name
+                    if name.startswith("chat_") and name.endswith(".json") and entry.is_file():
+                        try:
+                            chat_data = _read_json_file(entry.path)
+                            chat_id = chat_data.get('id') or name[len("chat_"):-len(".json")]
+                            # Insert directly — save_chat stamps updated_at
+                            # with the import time, which would scramble the
+                            # recency ordering of every migrated chat
+                            chat_data['id'] = chat_id
+                            self._insert_chat(chat_id, chat_data)
+                            imported += 1
+                        except Exception as e:
+                            print(f"⚠️ Error importing chat file {name}: {str(e)}")
+        except Exception as e:
+            print(f"⚠️ Error importing JSON chats: {str(e)}")
+        if imported:
+            print(f"✓ Imported {imported} chats into SQLite storage")
+
+    def _insert_chat(self, chat_id: str, chat_data: Dict):
+        """Upsert a chat row exactly as given, timestamps untouched"""
+        with self._conn_lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO chats (id, title, created_at, updated_at, message_count, data) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    chat_id,
+                    chat_data.get('title', 'Untitled Chat'),
+                    chat_data.get('created_at'),
+                    chat_data.get('updated_at'),
+                    len(chat_data.get('messages', [])),
+                    _json_dumps(chat_data),
+                ),
+            )
+            self._conn.commit()
+
+    def save_chat(self, chat_id: str, chat_data: Dict) -> bool:
+        """Save or update a chat (single upsert, durable under WAL)"""
+        try:
+            if 'created_at' not in chat_data:
+                chat_data['created_at'] = datetime.now().isoformat()
+            chat_data['updated_at'] = datetime.now().isoformat()
+            chat_data['id'] = chat_id
+
+            self._insert_chat(chat_id, chat_data)
+            return True
+
+        except Exception as e:
+            print(f"❌ Error saving chat {chat_id}: {str(e)}")
+            traceback.print_exc()
+            return False
+
+    def load_chat(self, chat_id: str) -> Optional[Dict]:
+        """Load a specific chat by id"""
+        try:
+            with self._conn_lock:
+                row = self._conn.execute(
+                    "SELECT data FROM chats WHERE id = ?", (chat_id,)
+                ).fetchone()
+            if row is None:
+                return None
+            return _json_loads(row[0])
+
+        except Exception as e:
+            print(f"❌ Error loading chat {chat_id}: {str(e)}")
+            traceback.print_exc()
+            return None
+
+    def delete_chat(self, chat_id: str) -> bool:
+        """Delete a chat by id"""
+        try:
+            with self._conn_lock:
+                cursor = self._conn.execute("DELETE FROM chats WHERE id = ?", (chat_id,))
+                self._conn.commit()
+            if cursor.rowcount:
+                print(f"✓ Deleted chat: {chat_id}")
+                return True
+            return False
+
+        except Exception as e:
+            print(f"❌ Error deleting chat {chat_id}: {str(e)}")
+            traceback.print_exc()
+            return False
+
+    def get_chat_list(self) -> List[Dict]:
+        """List chat metadata without touching the message blobs"""
+        try:
+            with self._conn_lock:
+                rows = self._conn.execute(
+                    "SELECT id, title, created_at, updated_at, message_count "
+                    "FROM chats ORDER BY updated_at DESC"
+                ).fetchall()
+            return [
+                {
+                    'id': row[0],
+                    'title': row[1],
+                    'created_at': row[2],
+                    'updated_at': row[3],
+                    'message_count': row[4],
+                }
+                for row in rows
+            ]
+
+        except Exception as e:
+            print(f"❌ Error getting chat list: {str(e)}")
+            traceback.print_exc()
+            return []
+
+    def load_all_chats(self) -> List[Dict]:
+        """Load all complete chats, most recently updated first"""
+        try:
+            with self._conn_lock:
+                rows = self._conn.execute(
+                    "SELECT data FROM chats ORDER BY updated_at DESC"
+                ).fetchall()
+            return [_json_loads(row[0]) for row in rows]
+
         except Exception as e:
             print(f"❌ Error loading all chats: {str(e)}")
             traceback.print_exc()
             return []
+
+    def close(self):
+        """Close the database connection (saves are already durable).
+
+        Idempotent so both backends expose the same shutdown hook.
+        """
+        with self._conn_lock:
+            try:
+                self._conn.close()
+            except sqlite3.ProgrammingError:
+                pass  # Already closed
+
+
+def create_chat_storage(storage_dir: str = "./chat_history"):
+    """Build the configured chat storage backend (JSON files by default)"""
+    backend = os.getenv("CHAT_STORAGE_BACKEND", "json").lower()
+    if backend == "sqlite":
+        return SQLiteChatStorage(storage_dir)
+    return ChatStorage(storage_dir)
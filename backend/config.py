@@ -1,4 +1,5 @@
 import os
+import types
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -14,25 +15,71 @@ class Config:
         print("    Set it with: export HUGGINGFACE_TOKEN=your_token_here")
         print("    Or in a .env file in the backend directory")
     
+    # Inference backend: "hf" (HuggingFace generate) or "vllm" (PagedAttention,
+    # fused kernels, continuous batching). Falls back to hf if vllm missing.
+    INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "hf").lower()
+    VLLM_GPU_MEMORY_UTILIZATION = float(os.getenv("VLLM_GPU_MEMORY_UTILIZATION", "0.90"))
+
     # Model Loading Settings
     USE_4BIT_QUANTIZATION = True
+    # Weight quantization mode: "4bit" (bitsandbytes NF4), "8bit", "awq"
+    # (pre-quantized INT4-AWQ checkpoint), "fp8" (vLLM backend only), "none"
+    QUANTIZATION = os.getenv("QUANTIZATION", "4bit" if USE_4BIT_QUANTIZATION else "none").lower()
+    # Speculative decoding: a small draft model proposes tokens the main
+    # model verifies in one pass. Empty string disables it.
+    DRAFT_MODEL_NAME = os.getenv("DRAFT_MODEL_NAME", "")
+    # How many tokens the draft proposes per verification step — higher
+    # values win when the draft agrees often, lose when it doesn't
+    NUM_ASSISTANT_TOKENS = int(os.getenv("NUM_ASSISTANT_TOKENS", "5"))
+    # Reuse the KV cache of each mode's static system prompt across
+    # requests — the attention prefill then only covers the new turn.
+    # Ignored when USE_CUDA_GRAPHS is on (static cache owns the KV layout).
+    USE_PREFIX_KV_CACHE = os.getenv("USE_PREFIX_KV_CACHE", "true").lower() == "true"
+    # Static KV cache + torch.compile reduce-overhead (CUDA graph capture).
+    # Removes per-step kernel launch overhead; off by default because
+    # compile warmup takes minutes and not all quantized setups support it.
+    USE_CUDA_GRAPHS = os.getenv("USE_CUDA_GRAPHS", "false").lower() == "true"
     MAX_NEW_TOKENS = 5000        # Model stops early when done — this is the ceiling, not the default
     TEMPERATURE = 0.7
     TOP_P = 0.9
     TOP_K = 50
     REPETITION_PENALTY = 1.1
     
+    # Request Batching Settings
+    # Concurrent generation requests arriving within the wait window are
+    # coalesced into one batched forward pass (decode is bandwidth-bound)
+    MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "8"))
+    MAX_BATCH_WAIT_MS = int(os.getenv("MAX_BATCH_WAIT_MS", "25"))
+    MAX_NUM_BATCH_TOKENS = int(os.getenv("MAX_NUM_BATCH_TOKENS", "8192"))
+    # Retrieval batching: concurrent semantic searches share one embedding
+    # encode and one vector-db query per (top_k, session) group
+    RETRIEVAL_BATCH_SIZE = int(os.getenv("RETRIEVAL_BATCH_SIZE", "16"))
+    RETRIEVAL_BATCH_WAIT_MS = int(os.getenv("RETRIEVAL_BATCH_WAIT_MS", "10"))
+
     # GPU Configuration
     DEVICE = "cuda"  # Will auto-fallback to CPU if CUDA not available
     CUDA_VISIBLE_DEVICES = os.getenv("CUDA_VISIBLE_DEVICES", "0")
     
     # Vector Database Settings
     VECTOR_DB_PATH = os.getenv("VECTOR_DB_PATH", "./chroma_db")
+    # Chunks are written to ChromaDB in slices of this size — one call per
+    # slice instead of per chunk, bounded to avoid memory spikes on huge docs
+    CHROMA_INSERT_BATCH = int(os.getenv("CHROMA_INSERT_BATCH", "256"))
     COLLECTION_NAME = "lumina_documents"
+    # HNSW index tuning (applied when the collection is first created).
+    # Higher M / ef improve recall at the cost of memory and build time.
+    HNSW_SPACE = "cosine"
+    HNSW_M = int(os.getenv("HNSW_M", "32"))
+    HNSW_CONSTRUCTION_EF = int(os.getenv("HNSW_CONSTRUCTION_EF", "200"))
+    HNSW_SEARCH_EF = int(os.getenv("HNSW_SEARCH_EF", "96"))
     EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
     EMBEDDING_DEVICE = "cuda"   # Use GPU for sentence-transformer; falls back to cpu if unavailable
     
     # RAG Settings
+    # Repeated/identical searches skip the encoder and vector db entirely;
+    # caches are invalidated whenever documents are added or deleted
+    SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "256"))
+    EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "512"))
     CHUNK_SIZE = 6000         # Doubled → half the chunks → 2x faster embedding
     CHUNK_OVERLAP = 200
     TOP_K_RETRIEVAL = 5
@@ -40,14 +87,18 @@ class Config:
     MAX_CHUNKS_PER_DOC = 500  # Raised cap to handle 50 MB documents
     
     # Document Processing
+    # Number of background workers draining the upload queue — text
+    # extraction/OCR is CPU-bound so several files can process in parallel
+    DOC_WORKER_COUNT = int(os.getenv("DOC_WORKER_COUNT", "2"))
     UPLOAD_DIR = os.path.abspath(os.getenv("UPLOAD_DIR", "./uploads"))
     MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB (hard HTTP limit)
     MAX_UPLOAD_SIZE_MB = 50           # Raised: allow full 50 MB uploads
-    ALLOWED_EXTENSIONS = {
+    # frozenset: hashed once at class-body time, checked on every upload
+    ALLOWED_EXTENSIONS = frozenset({
         'pdf', 'docx', 'doc', 'txt', 'md', 'markdown',
         'png', 'jpg', 'jpeg', 'gif', 'bmp', 'tiff', 'webp',
         'py', 'js', 'java', 'cpp', 'c', 'html', 'css', 'json', 'xml'
-    }
+    })
     
     # Storage Directories
     RAG_STORAGE_DIR = "./rag_storage"
@@ -59,11 +110,26 @@ class Config:
     WEB_SEARCH_API_KEY = os.getenv("WEB_SEARCH_API_KEY", "")
     WEB_SEARCH_PROVIDER = os.getenv("WEB_SEARCH_PROVIDER", "tavily")
     MAX_SEARCH_RESULTS = int(os.getenv("MAX_SEARCH_RESULTS", "5"))
+    # Repeated queries within the TTL skip the Tavily round-trip entirely
+    WEB_SEARCH_CACHE_SIZE = int(os.getenv("WEB_SEARCH_CACHE_SIZE", "512"))
+    WEB_SEARCH_CACHE_TTL = int(os.getenv("WEB_SEARCH_CACHE_TTL", "3600"))  # seconds
+    # HTTP/2 multiplexing for concurrent searches (needs httpx[http2])
+    WEB_SEARCH_HTTP2 = os.getenv("WEB_SEARCH_HTTP2", "true").lower() == "true"
+    # Per-source character budgets for the synthesis prompt — prompt length
+    # drives prefill time linearly and attention memory quadratically
+    WEB_RESULT_MAX_CHARS = int(os.getenv("WEB_RESULT_MAX_CHARS", "600"))
+    RAG_DOC_MAX_CHARS = int(os.getenv("RAG_DOC_MAX_CHARS", "1200"))
+    # Ceiling for the whole synthesis context — lowest-scored web results
+    # are dropped first until the context fits
+    SYNTHESIS_MAX_CONTEXT_CHARS = int(os.getenv("SYNTHESIS_MAX_CONTEXT_CHARS", "16000"))
     
     # API Settings
     FLASK_HOST = "127.0.0.1"
     FLASK_PORT = 5000
     FLASK_DEBUG = False
+    # Worker threads for the waitress WSGI server — requests mostly wait on
+    # the GPU or network, so more threads than cores is fine
+    WSGI_THREADS = int(os.getenv("WSGI_THREADS", "16"))
     
     # Mode-specific settings
     MODES = {
@@ -92,11 +158,16 @@ class Config:
             'top_k': 5
         }
     }
-    
+    # Freeze the mode table: read-only views keep the attribute lookups
+    # cache-friendly and rule out accidental mutation from request handlers
+    MODES = types.MappingProxyType({
+        mode: types.MappingProxyType(settings) for mode, settings in MODES.items()
+    })
+
     @staticmethod
     def create_directories():
         """Create necessary directories if they don't exist"""
-        dirs = [
+        dirs = {
             Config.UPLOAD_DIR,
             Config.RAG_STORAGE_DIR,
             Config.KNOWLEDGE_DATA_DIR,
@@ -105,6 +176,9 @@ class Config:
             Config.CHAT_HISTORY_DIR,
             os.path.join(Config.KNOWLEDGE_DATA_DIR, "examples"),
             os.path.join(Config.KNOWLEDGE_DATA_DIR, "prompts")
-        ]
+        }
         for directory in dirs:
-            os.makedirs(directory, exist_ok=True)
+            # makedirs stats every path component even when the leaf exists;
+            # one isdir check skips that on the common warm start
+            if not os.path.isdir(directory):
+                os.makedirs(directory, exist_ok=True)
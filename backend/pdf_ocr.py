@@ -0,0 +1,165 @@
+"""
+PDF Page Extraction / OCR Module
+Standalone on purpose: spawned PDF worker processes unpickle functions from
+this module, and importing it pulls in only fitz/PIL/pytesseract — not the
+utils package, whose __init__ loads the full ML stack (torch, transformers,
+chromadb). Workers therefore start in well under a second instead of paying
+a multi-gigabyte framework import each.
+"""
+
+import io
+import threading
+import fitz  # PyMuPDF
+from PIL import Image, ImageEnhance, ImageFilter
+import pytesseract
+
+# tesserocr keeps one in-process Tesseract instance alive across calls,
+# skipping the fork/exec + language-data load pytesseract pays per image
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+# Persistent OCR engines, one per language pack; the underlying API is
+# not thread-safe so calls serialize behind the lock
+_TESS_LOCK = threading.Lock()
+_TESS_APIS = {}
+
+
+def ocr_image(image, lang='eng', psm=6):
+    """Run OCR on a PIL image, preferring the persistent in-process engine"""
+    if tesserocr is not None:
+        try:
+            with _TESS_LOCK:
+                api = _TESS_APIS.get(lang)
+                if api is None:
+                    api = tesserocr.PyTessBaseAPI(lang=lang, psm=psm)
+                    _TESS_APIS[lang] = api
+                api.SetPageSegMode(psm)
+                api.SetImage(image)
+                return api.GetUTF8Text().strip()
+        except Exception:
+            # Missing language data or init failure — fall through to the
+            # subprocess path, which raises the error type callers expect
+            pass
+    return pytesseract.image_to_string(
+        image,
+        lang=lang,
+        config=f'--oem 3 --psm {psm}'
+    ).strip()
+
+
+def preprocess_image_for_ocr(image: Image.Image) -> Image.Image:
+    """
+    Preprocess a PIL image to significantly improve Tesseract OCR accuracy.
+    Steps:
+      1. Convert to RGB (handles PNGs with alpha channel)
+      2. Convert to grayscale
+      3. Upscale to at least 1500px wide (improves small-text recognition)
+      4. Enhance contrast and apply light sharpening
+      5. Convert to pure B&W (binarize) to remove noise
+
+    Returns processed image, or original if any step fails
+    """
+    try:
+        original_image = image
+
+        # 1. Ensure RGB first (RGBA/P mode images need conversion)
+        if image.mode in ('RGBA', 'P', 'LA'):
+            image = image.convert('RGB')
+
+        # 2. Grayscale
+        image = image.convert('L')
+
+        # 3. Upscale if too small — Tesseract needs ~300 DPI; target min 1500px wide
+        min_width = 1500
+        if image.width < min_width:
+            scale = min_width / image.width
+            new_size = (int(image.width * scale), int(image.height * scale))
+            # Cap maximum upscaling to prevent memory issues
+            if new_size[0] > 10000 or new_size[1] > 10000:
+                print(f"⚠️  Image upscaling capped to prevent memory issues")
+                new_size = (min(new_size[0], 8000), min(new_size[1], 8000))
+            image = image.resize(new_size, Image.LANCZOS)
+
+        # 4. Enhance contrast
+        try:
+            enhancer = ImageEnhance.Contrast(image)
+            image = enhancer.enhance(2.0)
+        except Exception as e:
+            print(f"⚠️  Contrast enhancement failed: {e}")
+
+        # 5. Sharpen
+        try:
+            image = image.filter(ImageFilter.SHARPEN)
+        except Exception as e:
+            print(f"⚠️  Sharpening failed: {e}")
+
+        # 6. Binarize (threshold to pure black/white)
+        try:
+            image = image.point(lambda x: 0 if x < 140 else 255, '1').convert('L')
+        except Exception as e:
+            print(f"⚠️  Binarization failed, using grayscale: {e}")
+            # Fallback to grayscale if binarization fails
+
+        return image
+    except Exception as e:
+        print(f"⚠️  Image preprocessing failed, returning original: {e}")
+        return original_image
+
+
+def extract_pdf_page(page, page_num, total_pages):
+    """
+    Extract text from one PDF page, falling back to OCR for scanned pages.
+
+    Returns (formatted_text_or_empty, used_ocr).
+    """
+    page_text = page.get_text().strip()
+    used_ocr = False
+
+    # If PyMuPDF returned almost nothing, this is likely a scanned page
+    if len(page_text) < 50:
+        try:
+            # Render at 2× scale (~144 DPI) for good OCR quality
+            mat = fitz.Matrix(2.0, 2.0)
+            pix = page.get_pixmap(matrix=mat)
+            img_bytes = pix.tobytes("png")
+            img = Image.open(io.BytesIO(img_bytes))
+            img = preprocess_image_for_ocr(img)
+            page_text = ocr_image(img, psm=6)
+            if page_text:
+                used_ocr = True
+        except Exception as ocr_err:
+            print(f"    ⚠️  OCR failed for page {page_num + 1}: {ocr_err}")
+            page_text = ""
+
+    if page_text:
+        return f"[Page {page_num + 1} of {total_pages}]\n{page_text}", used_ocr
+    return "", used_ocr
+
+
+def extract_pdf_page_range(args):
+    """Worker: extract a contiguous page range from its own document handle.
+
+    fitz documents are not safely shareable across processes, so each
+    worker reopens the file; page extraction itself is fully independent.
+    """
+    file_path, start, end, total_pages = args
+    doc = fitz.open(file_path)
+    try:
+        parts = []
+        ocr_pages = 0
+        for page_num in range(start, end):
+            page_text, used_ocr = extract_pdf_page(
+                doc[page_num], page_num, total_pages
+            )
+            if used_ocr:
+                ocr_pages += 1
+            if page_text:
+                parts.append(page_text)
+        return parts, ocr_pages
+    finally:
+        try:
+            doc.close()
+        except Exception:
+            pass
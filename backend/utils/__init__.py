@@ -6,6 +6,7 @@ from .model_loader import ModelManager, load_llama_model, get_gpu_info
 from .document_processor import DocumentProcessor
 from .rag_engine import RAGEngine
 from .prompt_builder import PromptBuilder
+from .batching import BatchingScheduler, RetrievalBatcher
 
 __all__ = [
     'ModelManager',
@@ -13,5 +14,7 @@ __all__ = [
     'get_gpu_info',
     'DocumentProcessor',
     'RAGEngine',
-    'PromptBuilder'
+    'PromptBuilder',
+    'BatchingScheduler',
+    'RetrievalBatcher'
 ]
@@ -0,0 +1,245 @@
+"""
+Batching Scheduler Module
+Coalesces concurrent generation requests into batched forward passes so the GPU
+runs one large decode instead of many tiny ones (continuous batching style)
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from config import Config
+
+
+class BatchingScheduler:
+    """
+    Request-level batching layer in front of ModelManager.generate.
+
+    Endpoints submit prompts and get back a Future; a dedicated worker thread
+    pops up to `max_batch_size` pending requests (or waits up to `max_wait_ms`
+    for more to arrive) and runs them through a single batched forward pass
+    via ModelManager.generate_batch. Requests with different sampling params
+    are grouped so each model call uses uniform settings.
+    """
+
+    def __init__(self, model_manager, max_batch_size=None, max_wait_ms=None,
+                 max_num_tokens=None):
+        self.model_manager = model_manager
+        self.max_batch_size = max_batch_size or Config.MAX_BATCH_SIZE
+        self.max_wait_ms = max_wait_ms or Config.MAX_BATCH_WAIT_MS
+        self.max_num_tokens = max_num_tokens or Config.MAX_NUM_BATCH_TOKENS
+        self._queue = queue.Queue()
+        self._shutdown_event = threading.Event()
+        self._worker = None
+
+    def start(self):
+        """Start the batching worker thread"""
+        if self._worker is not None and self._worker.is_alive():
+            return
+        self._shutdown_event.clear()
+        self._worker = threading.Thread(target=self._worker_loop, daemon=True)
+        self._worker.start()
+        print(f"⚡ Batching scheduler started (max_batch_size={self.max_batch_size}, "
+              f"max_wait_ms={self.max_wait_ms})")
+
+    def is_running(self):
+        """Check if the worker thread is alive"""
+        return self._worker is not None and self._worker.is_alive()
+
+    def shutdown(self):
+        """Signal the worker to stop after draining in-flight work"""
+        self._shutdown_event.set()
+
+    def submit(self, prompt, max_new_tokens=None, temperature=None,
+               top_p=None, top_k=None):
+        """
+        Submit a prompt for batched generation.
+
+        Returns:
+            concurrent.futures.Future resolving to the generated text
+        """
+        future = Future()
+        self._queue.put((prompt, {
+            'max_new_tokens': max_new_tokens,
+            'temperature': temperature,
+            'top_p': top_p,
+            'top_k': top_k
+        }, future))
+        return future
+
+    def _estimate_tokens(self, prompt):
+        """Rough token estimate (~4 chars/token) used for the batch token budget"""
+        return max(1, len(prompt) // 4)
+
+    def _collect_batch(self, first_item):
+        """Collect up to max_batch_size items within the max_wait_ms window"""
+        batch = [first_item]
+        token_budget = self._estimate_tokens(first_item[0])
+        deadline = time.monotonic() + (self.max_wait_ms / 1000.0)
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            token_budget += self._estimate_tokens(item[0])
+            batch.append(item)
+            if token_budget >= self.max_num_tokens:
+                break
+
+        return batch
+
+    def _worker_loop(self):
+        """Worker loop: pop requests, coalesce, run batched generation"""
+        print("⚡ Batching worker started")
+
+        while not self._shutdown_event.is_set():
+            try:
+                item = self._queue.get(timeout=1)
+            except queue.Empty:
+                continue
+
+            if item is None:  # Poison pill
+                break
+
+            batch = self._collect_batch(item)
+
+            # Group by sampling params — one generate call needs uniform settings
+            groups = {}
+            for prompt, params, future in batch:
+                # A caller that gave up (client disconnect) costs nothing
+                if future.cancelled():
+                    continue
+                key = (params.get('max_new_tokens'), params.get('temperature'),
+                       params.get('top_p'), params.get('top_k'))
+                groups.setdefault(key, []).append((prompt, future))
+
+            for (max_new_tokens, temperature, top_p, top_k), items in groups.items():
+                prompts = [prompt for prompt, _ in items]
+                futures = [future for _, future in items]
+                try:
+                    if len(prompts) == 1:
+                        results = [self.model_manager.generate(
+                            prompts[0],
+                            max_new_tokens=max_new_tokens,
+                            temperature=temperature,
+                            top_p=top_p,
+                            top_k=top_k
+                        )]
+                    else:
+                        print(f"⚡ Running batched generation ({len(prompts)} prompts)")
+                        results = self.model_manager.generate_batch(
+                            prompts,
+                            max_new_tokens=max_new_tokens,
+                            temperature=temperature,
+                            top_p=top_p,
+                            top_k=top_k
+                        )
+                    for future, result in zip(futures, results):
+                        future.set_result(result)
+                except Exception as e:
+                    for future in futures:
+                        if not future.done():
+                            future.set_exception(e)
+
+        print("🛑 Batching worker shutting down...")
+
+
+class RetrievalBatcher:
+    """
+    Coalesces concurrent semantic_search calls into batched retrievals.
+
+    Queries arriving within a short window are grouped by (top_k, session)
+    and run through RAGEngine.semantic_search_batch, which embeds all query
+    texts in one GPU encode and issues a single ChromaDB query per group.
+    """
+
+    def __init__(self, rag_engine, max_batch_size=None, max_wait_ms=None):
+        self.rag_engine = rag_engine
+        self.max_batch_size = max_batch_size or Config.RETRIEVAL_BATCH_SIZE
+        self.max_wait_ms = max_wait_ms or Config.RETRIEVAL_BATCH_WAIT_MS
+        self._queue = queue.Queue()
+        self._shutdown_event = threading.Event()
+        self._worker = None
+
+    def start(self):
+        """Start the retrieval worker thread"""
+        if self._worker is not None and self._worker.is_alive():
+            return
+        self._shutdown_event.clear()
+        self._worker = threading.Thread(target=self._worker_loop, daemon=True)
+        self._worker.start()
+        print(f"⚡ Retrieval batcher started (max_batch_size={self.max_batch_size}, "
+              f"max_wait_ms={self.max_wait_ms})")
+
+    def is_running(self):
+        """Check if the worker thread is alive"""
+        return self._worker is not None and self._worker.is_alive()
+
+    def shutdown(self):
+        """Signal the worker to stop"""
+        self._shutdown_event.set()
+
+    def submit(self, query, top_k=None, session_id=None):
+        """
+        Submit a search query for batched retrieval.
+
+        Returns:
+            concurrent.futures.Future resolving to the result list
+        """
+        future = Future()
+        self._queue.put((query, top_k, session_id, future))
+        return future
+
+    def _collect_batch(self, first_item):
+        """Collect up to max_batch_size queries within the wait window"""
+        batch = [first_item]
+        deadline = time.monotonic() + (self.max_wait_ms / 1000.0)
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _worker_loop(self):
+        """Worker loop: pop queries, group by filter, run batched search"""
+        while not self._shutdown_event.is_set():
+            try:
+                item = self._queue.get(timeout=1)
+            except queue.Empty:
+                continue
+
+            if item is None:  # Poison pill
+                break
+
+            batch = self._collect_batch(item)
+
+            # Group by (top_k, session) — one ChromaDB query per group
+            groups = {}
+            for query, top_k, session_id, future in batch:
+                key = (top_k, str(session_id) if session_id else None)
+                groups.setdefault(key, []).append((query, future))
+
+            for (top_k, session_id), items in groups.items():
+                queries = [query for query, _ in items]
+                futures = [future for _, future in items]
+                try:
+                    results = self.rag_engine.semantic_search_batch(
+                        queries, top_k=top_k, session_id=session_id
+                    )
+                    for future, result in zip(futures, results):
+                        future.set_result(result)
+                except Exception as e:
+                    for future in futures:
+                        if not future.done():
+                            future.set_exception(e)
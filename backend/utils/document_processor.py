@@ -3,24 +3,64 @@ Document Processor Module
 Handles text extraction from various file formats with enhanced OCR support.
 """
 
+import multiprocessing
 import os
 import fitz  # PyMuPDF
+from concurrent.futures import ProcessPoolExecutor
 from docx import Document
-from PIL import Image, ImageEnhance, ImageFilter
+from PIL import Image
 import pytesseract
 from config import Config
 import chardet
-import io
+
+# OCR and per-page PDF extraction live in the standalone pdf_ocr module:
+# spawned pool workers unpickle functions from there, and importing this
+# package would drag the whole ML stack (torch, transformers, chromadb)
+# into every worker via utils/__init__
+from pdf_ocr import (
+    extract_pdf_page as _extract_pdf_page_impl,
+    extract_pdf_page_range as _extract_pdf_page_range,
+    ocr_image as _ocr_image,
+    preprocess_image_for_ocr as _preprocess_image_for_ocr,
+)
+
+# PDFs with more pages than this are split across a process pool — below
+# it, worker startup costs more than the serial walk saves
+_PDF_PARALLEL_THRESHOLD = 32
 
 
 class DocumentProcessor:
 
+    # chardet's analysis converges within a few KB — feeding it a whole
+    # multi-MB file just burns CPU for the same answer
+    ENCODING_SAMPLE_SIZE = 64 * 1024
+
+    # Detection results memoized by (path, mtime, size) — text and code
+    # extraction both probe the same file during one upload
+    _encoding_cache = {}
+
     @staticmethod
     def detect_encoding(file_path):
-        """Detect file encoding"""
+        """Detect file encoding from a bounded sample, caching per file version"""
+        try:
+            stat = os.stat(file_path)
+            cache_key = (file_path, stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            cache_key = None
+
+        if cache_key is not None and cache_key in DocumentProcessor._encoding_cache:
+            return DocumentProcessor._encoding_cache[cache_key]
+
         with open(file_path, 'rb') as f:
-            result = chardet.detect(f.read())
-            return result['encoding']
+            sample = f.read(DocumentProcessor.ENCODING_SAMPLE_SIZE)
+        encoding = chardet.detect(sample)['encoding']
+
+        if cache_key is not None:
+            if len(DocumentProcessor._encoding_cache) > 256:
+                DocumentProcessor._encoding_cache.clear()
+            DocumentProcessor._encoding_cache[cache_key] = encoding
+
+        return encoding
 
     # -------------------------------------------------------------------------
     # Image preprocessing for better OCR accuracy
@@ -28,73 +68,29 @@ class DocumentProcessor:
 
     @staticmethod
     def preprocess_image_for_ocr(image: Image.Image) -> Image.Image:
-        """
-        Preprocess a PIL image to significantly improve Tesseract OCR accuracy.
-        Steps:
-          1. Convert to RGB (handles PNGs with alpha channel)
-          2. Convert to grayscale
-          3. Upscale to at least 1500px wide (improves small-text recognition)
-          4. Enhance contrast and apply light sharpening
-          5. Convert to pure B&W (binarize) to remove noise
-        
-        Returns processed image, or original if any step fails
-        """
-        try:
-            original_image = image
-            
-            # 1. Ensure RGB first (RGBA/P mode images need conversion)
-            if image.mode in ('RGBA', 'P', 'LA'):
-                image = image.convert('RGB')
-
-            # 2. Grayscale
-            image = image.convert('L')
-
-            # 3. Upscale if too small — Tesseract needs ~300 DPI; target min 1500px wide
-            min_width = 1500
-            if image.width < min_width:
-                scale = min_width / image.width
-                new_size = (int(image.width * scale), int(image.height * scale))
-                # Cap maximum upscaling to prevent memory issues
-                if new_size[0] > 10000 or new_size[1] > 10000:
-                    print(f"⚠️  Image upscaling capped to prevent memory issues")
-                    new_size = (min(new_size[0], 8000), min(new_size[1], 8000))
-                image = image.resize(new_size, Image.LANCZOS)
-
-            # 4. Enhance contrast
-            try:
-                enhancer = ImageEnhance.Contrast(image)
-                image = enhancer.enhance(2.0)
-            except Exception as e:
-                print(f"⚠️  Contrast enhancement failed: {e}")
-
-            # 5. Sharpen
-            try:
-                image = image.filter(ImageFilter.SHARPEN)
-            except Exception as e:
-                print(f"⚠️  Sharpening failed: {e}")
-
-            # 6. Binarize (threshold to pure black/white)
-            try:
-                image = image.point(lambda x: 0 if x < 140 else 255, '1').convert('L')
-            except Exception as e:
-                print(f"⚠️  Binarization failed, using grayscale: {e}")
-                # Fallback to grayscale if binarization fails
-
-            return image
-        except Exception as e:
-            print(f"⚠️  Image preprocessing failed, returning original: {e}")
-            return original_image
+        """Preprocess a PIL image for Tesseract (grayscale, upscale,
+        contrast, binarize) — implementation lives in pdf_ocr so spawned
+        workers can use it without importing this package"""
+        return _preprocess_image_for_ocr(image)
 
     # -------------------------------------------------------------------------
     # Extractors
     # -------------------------------------------------------------------------
 
+    @staticmethod
+    def _extract_pdf_page(page, page_num, total_pages):
+        """Extract text from one PDF page, falling back to OCR for scanned
+        pages. Returns (formatted_text_or_empty, used_ocr)."""
+        return _extract_pdf_page_impl(page, page_num, total_pages)
+
     @staticmethod
     def extract_text_from_pdf(file_path):
         """
         Extract text from PDF using PyMuPDF.
         For each page that has no selectable text (scanned pages), falls back to
         rendering the page as a high-res image and running Tesseract OCR on it.
+        Large documents fan pages out across a process pool — extraction is
+        independent per page, so it scales with cores.
         """
         doc = None
         try:
@@ -103,31 +99,38 @@ class DocumentProcessor:
             total_pages = len(doc)
             ocr_pages = 0
 
-            for page_num in range(total_pages):
-                page = doc[page_num]
-                page_text = page.get_text().strip()
-
-                # If PyMuPDF returned almost nothing, this is likely a scanned page
-                if len(page_text) < 50:
-                    try:
-                        # Render at 2× scale (~144 DPI) for good OCR quality
-                        mat = fitz.Matrix(2.0, 2.0)
-                        pix = page.get_pixmap(matrix=mat)
-                        img_bytes = pix.tobytes("png")
-                        img = Image.open(io.BytesIO(img_bytes))
-                        img = DocumentProcessor.preprocess_image_for_ocr(img)
-                        page_text = pytesseract.image_to_string(
-                            img,
-                            config='--oem 3 --psm 6'
-                        ).strip()
-                        if page_text:
-                            ocr_pages += 1
-                    except Exception as ocr_err:
-                        print(f"    ⚠️  OCR failed for page {page_num + 1}: {ocr_err}")
-                        page_text = ""
-
-                if page_text:
-                    text_parts.append(f"[Page {page_num + 1} of {total_pages}]\n{page_text}")
+            workers = min(os.cpu_count() or 1, 8)
+            if total_pages > _PDF_PARALLEL_THRESHOLD and workers > 1:
+                # Contiguous ranges keep results in page order
+                per_worker = -(-total_pages // workers)
+                ranges = [
+                    (file_path, start, min(start + per_worker, total_pages), total_pages)
+                    for start in range(0, total_pages, per_worker)
+                ]
+                doc.close()
+                doc = None
+                # spawn, not fork: the server is multithreaded and may hold
+                # a CUDA context — forked children would inherit locks and
+                # a CUDA state they cannot safely use. The worker lives in
+                # pdf_ocr, so spawned children import only fitz/PIL, not
+                # this package's ML stack
+                with ProcessPoolExecutor(
+                    max_workers=len(ranges),
+                    mp_context=multiprocessing.get_context("spawn"),
+                ) as executor:
+                    for parts, range_ocr in executor.map(_extract_pdf_page_range, ranges):
+                        text_parts.extend(parts)
+                        ocr_pages += range_ocr
+            else:
+                # Iterate the document directly instead of indexing doc[i]
+                for page_num, page in enumerate(doc):
+                    page_text, used_ocr = DocumentProcessor._extract_pdf_page(
+                        page, page_num, total_pages
+                    )
+                    if used_ocr:
+                        ocr_pages += 1
+                    if page_text:
+                        text_parts.append(page_text)
 
             if ocr_pages:
                 print(f"    🔍 OCR applied to {ocr_pages} scanned page(s)")
@@ -145,35 +148,78 @@ class DocumentProcessor:
                 except Exception:
                     pass
 
+    # WordprocessingML namespace for the raw-XML fast path
+    _DOCX_NS = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+
+    @staticmethod
+    def _extract_docx_xml(file_path):
+        """Pull paragraph text straight out of word/document.xml.
+
+        One C-level XML pass over the zip entry replaces thousands of
+        python-docx attribute walks; table cell paragraphs are ordinary
+        w:p elements, so document order is preserved for free.
+        """
+        import zipfile
+        from lxml import etree
+
+        parts = []
+        para_tag = f'{{{DocumentProcessor._DOCX_NS}}}p'
+        with zipfile.ZipFile(file_path) as z, z.open('word/document.xml') as f:
+            for _, element in etree.iterparse(f, tag=para_tag):
+                text = ''.join(element.itertext())
+                if text:
+                    parts.append(text)
+                element.clear()
+        return "\n".join(parts).strip()
+
     @staticmethod
     def extract_text_from_docx(file_path):
         """Extract text from DOCX file"""
+        try:
+            return DocumentProcessor._extract_docx_xml(file_path)
+        except Exception as e:
+            print(f"⚠️  Fast DOCX parse failed ({e}), using python-docx")
+
         try:
             doc = Document(file_path)
-            text = ""
 
-            for paragraph in doc.paragraphs:
-                text += paragraph.text + "\n"
+            # Collect parts and join once — += on str reallocates the whole
+            # buffer every iteration, going quadratic on large documents
+            parts = [paragraph.text for paragraph in doc.paragraphs]
 
             # Also extract text from tables
             for table in doc.tables:
                 for row in table.rows:
-                    for cell in row.cells:
-                        text += cell.text + "\t"
-                    text += "\n"
+                    parts.append("\t".join(cell.text for cell in row.cells))
 
-            return text.strip()
+            return "\n".join(parts).strip()
         except Exception as e:
             print(f"Error extracting text from DOCX: {e}")
             return ""
 
+    @staticmethod
+    def _read_text_file(file_path):
+        """Read a text file with one binary read and one decode.
+
+        The old path read the file twice — once for chardet, once through
+        the text-mode wrapper — and decoded incrementally. Most files are
+        UTF-8, so try that directly and only run chardet (on the sample
+        already in memory) when strict decoding fails.
+        """
+        with open(file_path, 'rb') as f:
+            raw = f.read()
+        try:
+            return raw.decode('utf-8')
+        except UnicodeDecodeError:
+            sample = raw[:DocumentProcessor.ENCODING_SAMPLE_SIZE]
+            encoding = chardet.detect(sample)['encoding']
+            return raw.decode(encoding or 'utf-8', errors='ignore')
+
     @staticmethod
     def extract_text_from_txt(file_path):
         """Extract text from TXT file"""
         try:
-            encoding = DocumentProcessor.detect_encoding(file_path)
-            with open(file_path, 'r', encoding=encoding or 'utf-8', errors='ignore') as f:
-                return f.read()
+            return DocumentProcessor._read_text_file(file_path)
         except Exception as e:
             print(f"Error extracting text from TXT: {e}")
             return ""
@@ -195,24 +241,13 @@ class DocumentProcessor:
 
             # Try multi-language first (eng + hin for Indian documents), fallback to eng
             try:
-                text = pytesseract.image_to_string(
-                    processed,
-                    lang='eng+hin',
-                    config='--oem 3 --psm 6'
-                ).strip()
+                text = _ocr_image(processed, lang='eng+hin', psm=6)
             except pytesseract.TesseractError:
-                text = pytesseract.image_to_string(
-                    processed,
-                    lang='eng',
-                    config='--oem 3 --psm 6'
-                ).strip()
+                text = _ocr_image(processed, lang='eng', psm=6)
 
             if not text:
                 # Last resort: try without preprocessing
-                text = pytesseract.image_to_string(
-                    image,
-                    config='--oem 3 --psm 3'
-                ).strip()
+                text = _ocr_image(image, psm=3)
 
             return text if text else f"[Image file: {os.path.basename(file_path)} — no text detected by OCR]"
 
@@ -246,12 +281,10 @@ class DocumentProcessor:
     def extract_text_from_code(file_path):
         """Extract text from code files"""
         try:
-            encoding = DocumentProcessor.detect_encoding(file_path)
-            with open(file_path, 'r', encoding=encoding or 'utf-8', errors='ignore') as f:
-                code = f.read()
-                # Add language identifier based on extension
-                ext = os.path.splitext(file_path)[1][1:]
-                return f"```{ext}\n{code}\n```"
+            code = DocumentProcessor._read_text_file(file_path)
+            # Add language identifier based on extension
+            ext = os.path.splitext(file_path)[1][1:]
+            return f"```{ext}\n{code}\n```"
         except Exception as e:
             print(f"Error extracting text from code file: {e}")
             return ""
@@ -260,6 +293,35 @@ class DocumentProcessor:
     # Unified interface
     # -------------------------------------------------------------------------
 
+    @staticmethod
+    def _sniff_doc_type(file_path, ext_type):
+        """Verify the extension-derived type against the file's magic bytes.
+
+        A mislabeled file fed to the wrong extractor wastes a full parse
+        attempt (e.g. chardet churning on binary), so the ambiguous
+        container formats are checked before dispatch.
+        """
+        try:
+            with open(file_path, 'rb') as f:
+                head = f.read(8)
+        except OSError:
+            return ext_type
+
+        if head.startswith(b'%PDF'):
+            return 'pdf'
+        if ext_type == 'pdf':
+            # Claimed pdf without the signature — treat as plain text
+            return 'text'
+        if ext_type == 'docx' and not head.startswith(b'PK\x03\x04'):
+            # docx is a zip container. Legacy binary .doc files are OLE
+            # containers — keep them on the docx path so extraction fails
+            # visibly instead of chardet silently indexing binary garbage
+            if head.startswith(b'\xd0\xcf\x11\xe0'):
+                return ext_type
+            # Anything else binary-ish would crash python-docx — plain text
+            return 'text'
+        return ext_type
+
     @staticmethod
     def process_document(file_path):
         """
@@ -271,13 +333,15 @@ class DocumentProcessor:
 
         print(f"Processing document: {filename} (type: {file_ext})")
 
-        text = ""
-        doc_type = "unknown"
         page_count = None
 
-        if file_ext == 'pdf':
-            text = DocumentProcessor.extract_text_from_pdf(file_path)
-            doc_type = "pdf"
+        # O(1) dispatch instead of the old elif chain; unknown extensions
+        # fall through to the text extractor
+        doc_type = _EXT_TO_TYPE.get(file_ext, 'text')
+        doc_type = DocumentProcessor._sniff_doc_type(file_path, doc_type)
+        text = _TYPE_TO_EXTRACTOR[doc_type](file_path)
+
+        if doc_type == 'pdf':
             # Estimate page count from [Page N of M] markers
             try:
                 import re
@@ -286,31 +350,6 @@ class DocumentProcessor:
             except Exception:
                 pass
 
-        elif file_ext in ['docx', 'doc']:
-            text = DocumentProcessor.extract_text_from_docx(file_path)
-            doc_type = "docx"
-
-        elif file_ext == 'txt':
-            text = DocumentProcessor.extract_text_from_txt(file_path)
-            doc_type = "text"
-
-        elif file_ext in ['md', 'markdown']:
-            text = DocumentProcessor.extract_text_from_markdown(file_path)
-            doc_type = "markdown"
-
-        elif file_ext in ['png', 'jpg', 'jpeg', 'gif', 'bmp', 'tiff', 'webp']:
-            text = DocumentProcessor.extract_text_from_image(file_path)
-            doc_type = "image"
-
-        elif file_ext in ['py', 'js', 'java', 'cpp', 'c', 'html', 'css', 'json', 'xml']:
-            text = DocumentProcessor.extract_text_from_code(file_path)
-            doc_type = "code"
-
-        else:
-            # Try as text file
-            text = DocumentProcessor.extract_text_from_txt(file_path)
-            doc_type = "text"
-
         result = {
             "filename": filename,
             "file_path": file_path,
@@ -329,6 +368,31 @@ class DocumentProcessor:
         return result
 
 
+# Dispatch tables built once at import: extension → document type and
+# document type → extractor
+_EXT_TO_TYPE = {
+    'pdf': 'pdf',
+    'docx': 'docx',
+    'doc': 'docx',
+    'txt': 'text',
+    'md': 'markdown',
+    'markdown': 'markdown',
+    'png': 'image', 'jpg': 'image', 'jpeg': 'image', 'gif': 'image',
+    'bmp': 'image', 'tiff': 'image', 'webp': 'image',
+    'py': 'code', 'js': 'code', 'java': 'code', 'cpp': 'code', 'c': 'code',
+    'html': 'code', 'css': 'code', 'json': 'code', 'xml': 'code',
+}
+
+_TYPE_TO_EXTRACTOR = {
+    'pdf': DocumentProcessor.extract_text_from_pdf,
+    'docx': DocumentProcessor.extract_text_from_docx,
+    'text': DocumentProcessor.extract_text_from_txt,
+    'markdown': DocumentProcessor.extract_text_from_markdown,
+    'image': DocumentProcessor.extract_text_from_image,
+    'code': DocumentProcessor.extract_text_from_code,
+}
+
+
 if __name__ == "__main__":
     # Test document processing
     import sys
@@ -3,9 +3,88 @@ Prompt Builder Module
 Handles prompt construction for different modes and contexts
 """
 
+import re
+
 from config import Config
 from datetime import datetime
 
+# Patterns for format_response, compiled once — the line loop runs them on
+# every line of every model response. One alternation classifies each line
+# as bullet / numbered section / header in a single match.
+_LINE_RE = re.compile(
+    r'^(?:'
+    r'(?:\*|\-|•|●|\+|–|‣|⁃)\s+(?P<bullet>.+)'
+    r'|(?P<numbered>\d+\.\s+.+)'
+    r'|(?P<header>\*\*.*\*\*|#{1,3}\s+.+)'
+    r')$'
+)
+_BOLD_HEADER_RE = re.compile(r'^\*\*.+\*\*$')
+
+
+def _iter_formatted(lines):
+    """Yield formatted output lines in a single pass.
+
+    Blank separators are deferred (pending_blank) and emitted only right
+    before the next content line, so at most one blank ever appears between
+    blocks and none leak at the edges — no post-hoc newline-collapsing scan
+    over the joined result is needed.
+    """
+    started = False         # anything yielded yet
+    pending_blank = False   # blank separator owed before the next line
+    prev_was_bullet = False
+
+    for line in lines:
+        stripped = line.strip()
+
+        # Runs of blank lines collapse into a single pending separator
+        if not stripped:
+            pending_blank = started
+            prev_was_bullet = False
+            continue
+
+        match = _LINE_RE.match(stripped)
+        is_bullet = False
+        if match:
+            content = match.group('bullet')
+            if content is not None:
+                if _BOLD_HEADER_RE.match(content):
+                    # Bullet whose content is a bold header (e.g.
+                    # "* **Key Ideas**") is really a section header
+                    out = content
+                    separate = True
+                else:
+                    # Standardize bullets to hyphens; blank line only
+                    # before the first bullet of a group
+                    out = f'- {content}'
+                    separate = not prev_was_bullet
+                    is_bullet = True
+            elif match.group('numbered') is not None:
+                out = stripped
+                separate = True
+            else:
+                # Section header — drop bold markers to keep headers simple
+                if stripped.startswith('**') and stripped.endswith('**'):
+                    out = stripped[2:-2]
+                else:
+                    out = stripped
+                if not out:
+                    # A bare "****" strips to nothing — acts as a blank line
+                    pending_blank = started
+                    prev_was_bullet = False
+                    continue
+                separate = True
+        else:
+            # Regular line — blank separator after a bullet group ends
+            out = stripped
+            separate = prev_was_bullet
+
+        if started and (pending_blank or separate):
+            yield ''
+        yield out
+        pending_blank = False
+        prev_was_bullet = is_bullet
+        started = True
+
 class PromptBuilder:
     
     # System prompts for different modes
@@ -81,92 +160,93 @@ When helping with code:
 5. Suggest optimizations when relevant
 Support multiple programming languages and frameworks."""
     }
-    
+
+    # Precomposed constant prompt fragments — built once at class creation
+    # instead of reformatting the same static text on every request
+    _CHAT_SYSTEM_PREFIX = f"System: {SYSTEM_PROMPTS['chat']}\n"
+
+    _RAG_INSTRUCTIONS = (
+        "\n\nIMPORTANT: The user has uploaded document(s). The text below is extracted via OCR or PDF parsing, "
+        "so it may contain formatting artifacts, weird symbols, or jumbled layouts. "
+        "DO NOT dismiss the document as a 'sample', 'template', or 'example' just because the text looks messy. "
+        "Treat it as a REAL document. You MUST read this content carefully and extract the ACTUAL details "
+        "visible in the text (such as specific names, ID numbers, addresses, DOBs, marks, or organizations) exactly as they appear. "
+        "Answer the user's question based ONLY on what is in the document(s). "
+        "If the information requested is not found, say so explicitly.\n"
+    )
+
+    _SUMMARIZE_TEMPLATE = SYSTEM_PROMPTS['summarize'] + """
+
+Text to summarize:
+{text}
+
+Please provide a structured summary:"""
+
     @staticmethod
     def build_chat_prompt(user_message, context_docs=None, conversation_history=None):
         """Build prompt for chat mode"""
-        prompt_parts = []
-        
-        # System prompt
-        prompt_parts.append(f"System: {PromptBuilder.SYSTEM_PROMPTS['chat']}\n")
-        
+        prompt_parts = [PromptBuilder._CHAT_SYSTEM_PREFIX]
+
         # Add context if available — use grounded RAG instructions
         if context_docs and len(context_docs) > 0:
-            # Build context with source info
-            context_parts = []
-            for i, doc in enumerate(context_docs[:5], 1):
-                source = doc.get('metadata', {}).get('filename', 'Uploaded Document')
-                context_parts.append(f"[Document: {source}]\n{doc['document']}")
-            context_text = "\n\n".join(context_parts)
-            
-            prompt_parts.append(
-                "\n\nIMPORTANT: The user has uploaded document(s). The text below is extracted via OCR or PDF parsing, "
-                "so it may contain formatting artifacts, weird symbols, or jumbled layouts. "
-                "DO NOT dismiss the document as a 'sample', 'template', or 'example' just because the text looks messy. "
-                "Treat it as a REAL document. You MUST read this content carefully and extract the ACTUAL details "
-                "visible in the text (such as specific names, ID numbers, addresses, DOBs, marks, or organizations) exactly as they appear. "
-                "Answer the user's question based ONLY on what is in the document(s). "
-                "If the information requested is not found, say so explicitly.\n"
+            # Build context with source info — one comprehension + join
+            # keeps the per-doc work inside C string machinery
+            context_text = "\n\n".join(
+                f"[Document: {doc.get('metadata', {}).get('filename', 'Uploaded Document')}]\n{doc['document']}"
+                for doc in context_docs[:5]
             )
+
+            prompt_parts.append(PromptBuilder._RAG_INSTRUCTIONS)
             prompt_parts.append(f"\n--- UPLOADED DOCUMENT CONTENT ---\n{context_text}\n--- END OF DOCUMENT CONTENT ---\n")
-        
-        # Add conversation history if available
+
+        # Add conversation history if available (last 3 exchanges)
         if conversation_history:
-            for msg in conversation_history[-3:]:  # Last 3 exchanges
-                role = msg.get('role', 'user')
-                content = msg.get('content', '')
-                prompt_parts.append(f"\n{role.capitalize()}: {content}")
-        
+            prompt_parts.append("".join(
+                f"\n{msg.get('role', 'user').capitalize()}: {msg.get('content', '')}"
+                for msg in conversation_history[-3:]
+            ))
+
         # Add current user message
         prompt_parts.append(f"\nUser: {user_message}\n\nAssistant:")
-        
+
         return "".join(prompt_parts)
     
     @staticmethod
     def build_summarize_prompt(text_to_summarize):
         """Build prompt for summarize mode"""
-        prompt = f"""{PromptBuilder.SYSTEM_PROMPTS['summarize']}
-
-Text to summarize:
-{text_to_summarize}
-
-Please provide a structured summary:"""
-        
-        return prompt
+        return PromptBuilder._SUMMARIZE_TEMPLATE.format(text=text_to_summarize)
     
     @staticmethod
     def build_deep_research_prompt(query, context_docs):
         """Build prompt for deep research mode"""
-        prompt_parts = [PromptBuilder.SYSTEM_PROMPTS['deep-research']]
-        
-        # Add all relevant context
+        # All relevant context in one comprehension + join
+        materials = ""
         if context_docs:
-            prompt_parts.append("\n\nAvailable Research Materials:")
-            for i, doc in enumerate(context_docs, 1):
-                source = doc.get('metadata', {}).get('filename', 'Unknown')
-                prompt_parts.append(f"\n[Source {i}: {source}]")
-                prompt_parts.append(f"{doc['document']}\n")
-        
-        prompt_parts.append(f"\n\nResearch Query: {query}")
-        prompt_parts.append("\n\nProvide a comprehensive research response:")
-        
-        return "".join(prompt_parts)
-    
+            sources = "".join(
+                f"\n[Source {i}: {doc.get('metadata', {}).get('filename', 'Unknown')}]{doc['document']}\n"
+                for i, doc in enumerate(context_docs, 1)
+            )
+            materials = f"\n\nAvailable Research Materials:{sources}"
+
+        return (
+            f"{PromptBuilder.SYSTEM_PROMPTS['deep-research']}{materials}"
+            f"\n\nResearch Query: {query}"
+            "\n\nProvide a comprehensive research response:"
+        )
+
     @staticmethod
     def build_coding_prompt(user_message, context_docs=None):
         """Build prompt for coding mode"""
-        prompt_parts = [PromptBuilder.SYSTEM_PROMPTS['coding']]
-        
-        # Add code context if available
+        context = ""
         if context_docs:
-            prompt_parts.append("\n\nRelevant Code Context:")
-            for doc in context_docs[:2]:
-                prompt_parts.append(f"\n{doc['document']}\n")
-        
-        prompt_parts.append(f"\n\nUser Request: {user_message}")
-        prompt_parts.append("\n\nResponse:")
-        
-        return "".join(prompt_parts)
+            snippets = "".join(f"\n{doc['document']}\n" for doc in context_docs[:2])
+            context = f"\n\nRelevant Code Context:{snippets}"
+
+        return (
+            f"{PromptBuilder.SYSTEM_PROMPTS['coding']}{context}"
+            f"\n\nUser Request: {user_message}"
+            "\n\nResponse:"
+        )
     
     @staticmethod
     def build_prompt(mode, user_message, context_docs=None, **kwargs):
@@ -190,104 +270,9 @@ Please provide a structured summary:"""
     @staticmethod
     def format_response(mode, response_text):
         """Format response based on mode with intelligent post-processing"""
-        import re
-        
-        # Strip leading/trailing whitespace
-        text = response_text.strip()
-        
-        # Post-process bullet points for better formatting
-        lines = text.split('\n')
-        formatted_lines = []
-        prev_was_bullet = False
-        prev_was_blank = False
-        
-        for i, line in enumerate(lines):
-            stripped = line.strip()
-            
-            # Skip excessive blank lines (max 1 consecutive blank line)
-            if not stripped:
-                if not prev_was_blank:
-                    formatted_lines.append('')
-                    prev_was_blank = True
-                prev_was_bullet = False
-                continue
-            
-            prev_was_blank = False
-            
-            # Detect bullet points (various formats: *, -, •, +, etc.)
-            bullet_match = re.match(r'^(\s*)(\*|\-|•|●|\+|–|‣|⁃)(\s+)(.+)$', stripped)
-            
-            if bullet_match:
-                indent_spaces = bullet_match.group(1)
-                content = bullet_match.group(4)
-                
-                # Check if content is a bold header (e.g., "**Key Ideas**")
-                # If so, treat it as a section header instead of a bullet
-                if re.match(r'^\*\*.+\*\*$', content.strip()):
-                    # Add spacing before section header
-                    if formatted_lines and formatted_lines[-1] != '':
-                        formatted_lines.append('')
-                    
-                    formatted_lines.append(content.strip())
-                    prev_was_bullet = False
-                else:
-                    # Regular bullet point
-                    # Add blank line before first bullet in a group
-                    if not prev_was_bullet and formatted_lines and formatted_lines[-1] != '':
-                        formatted_lines.append('')
-                    
-                    # Determine indentation level based on leading spaces
-                    indent_level = len(indent_spaces) // 2  # Every 2 spaces = 1 level
-                    
-                    # Standardize to hyphen with proper spacing
-                    # Use 2 spaces per indentation level
-                    indent = '  ' * indent_level
-                    formatted_lines.append(f'{indent}- {content}')
-                    
-                    prev_was_bullet = True
-            
-            # Detect numbered sections (e.g., "1. Section Name")
-            elif re.match(r'^\d+\.\s+.+$', stripped):
-                # Add spacing before numbered sections
-                if formatted_lines and formatted_lines[-1] != '':
-                    formatted_lines.append('')
-                
-                # Keep numbered sections as-is (don't bold)
-                formatted_lines.append(stripped)
-                prev_was_bullet = False
-            
-            # Detect section headers (look for common patterns)
-            elif re.match(r'^(\*\*.*\*\*|#{1,3}\s+.+)$', stripped):
-                # Add spacing before headers
-                if formatted_lines and formatted_lines[-1] != '':
-                    formatted_lines.append('')
-                
-                # Remove bold formatting from headers to keep them simple
-                if stripped.startswith('**') and stripped.endswith('**'):
-                    # Remove the bold markers
-                    formatted_lines.append(stripped[2:-2])
-                else:
-                    formatted_lines.append(stripped)
-                
-                prev_was_bullet = False
-            
-            else:
-                # Regular line
-                # Add spacing after bullet group ends
-                if prev_was_bullet and not bullet_match:
-                    if formatted_lines and formatted_lines[-1] != '':
-                        formatted_lines.append('')
-                
-                formatted_lines.append(stripped)
-                prev_was_bullet = False
-        
-        # Join lines and clean up excessive spacing
-        result = '\n'.join(formatted_lines)
-        
-        # Remove more than 2 consecutive newlines
-        result = re.sub(r'\n{3,}', '\n\n', result)
-        
-        return result.strip()
+        # The input is stripped first so the state machine never sees
+        # leading/trailing blank lines; its output needs no cleanup pass
+        return '\n'.join(_iter_formatted(response_text.strip().splitlines()))
 
 
 if __name__ == "__main__":
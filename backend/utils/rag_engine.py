@@ -4,27 +4,56 @@ Handles document chunking, embedding generation, vector storage, and semantic se
 """
 
 import chromadb
+import numpy as np
 from chromadb.config import Settings
 from sentence_transformers import SentenceTransformer
 from config import Config
+import bisect
+import hashlib
+import json
+import re
+import threading
 import uuid
+from collections import OrderedDict
 from datetime import datetime
 
+# Sentence boundaries used by chunk_text — one compiled pass over the whole
+# text replaces repeated rfind scans on substring copies of each window
+_SENTENCE_BOUNDARY_RE = re.compile(r'(?:\. |\.\n|! |\? |\?\n)')
+
 class RAGEngine:
     _instance = None
-    
+    _initialized = False
+    _init_lock = threading.Lock()
+
     def __new__(cls):
         if cls._instance is None:
-            cls._instance = super(RAGEngine, cls).__new__(cls)
+            with cls._init_lock:
+                if cls._instance is None:
+                    cls._instance = super(RAGEngine, cls).__new__(cls)
         return cls._instance
-    
+
     def __init__(self):
-        if not hasattr(self, 'initialized'):
+        # Lock-guarded one-time init — two request threads constructing the
+        # singleton concurrently must not double-load the embedding model
+        if RAGEngine._initialized:
+            return
+        with RAGEngine._init_lock:
+            if RAGEngine._initialized:
+                return
             print("Initializing RAG Engine...")
             self.embedding_model = self._load_embedding_model()
             self.client = self._init_chromadb()
             self.collection = self._get_or_create_collection()
-            self.initialized = True
+            # LRU caches for repeated queries — invalidated on any write
+            self._search_cache = OrderedDict()
+            self._embedding_cache = OrderedDict()
+            self._documents_cache = {}  # session key -> document list
+            self._cache_lock = threading.Lock()
+            # Bumped on every write; stale search entries simply stop
+            # matching and age out of the LRU instead of being swept
+            self._index_version = 0
+            RAGEngine._initialized = True
             print(f"✓ RAG Engine initialized with {self.collection.count()} documents")
     
     def _load_embedding_model(self):
@@ -40,6 +69,14 @@ class RAGEngine:
                 print(f"🚀 GPU detected for embeddings: {gpu_name}")
         print(f"Loading embedding model: {Config.EMBEDDING_MODEL} on [{device_pref}]")
         model = SentenceTransformer(Config.EMBEDDING_MODEL, device=device_pref)
+        if device_pref == 'cuda':
+            # FP16 halves weight bandwidth and runs the GEMMs on tensor
+            # cores; MiniLM loses no meaningful retrieval accuracy
+            try:
+                model.half()
+                print("✓ Embedding model running in FP16")
+            except Exception as e:
+                print(f"⚠️  Could not switch embeddings to FP16 ({e}) — staying FP32")
         print(f"✓ Embedding model loaded on [{device_pref}]")
         self._embedding_device = device_pref
         return model
@@ -60,11 +97,28 @@ class RAGEngine:
         try:
             collection = self.client.get_collection(name=Config.COLLECTION_NAME)
             print(f"✓ Using existing collection: {Config.COLLECTION_NAME}")
+            # HNSW params (search_ef included) are snapshotted into the
+            # vector segment when the collection is created — modify() only
+            # rewrites the collection record, never the index. Surface the
+            # mismatch instead of pretending to retune.
+            current_ef = (collection.metadata or {}).get("hnsw:search_ef")
+            if current_ef is not None and current_ef != Config.HNSW_SEARCH_EF:
+                print(f"⚠️ Collection was built with hnsw:search_ef={current_ef} "
+                      f"(config wants {Config.HNSW_SEARCH_EF}) — recreate the "
+                      f"collection to apply the new value")
         except Exception as e:
             print(f"Collection not found ({str(e)}), creating new one...")
             collection = self.client.create_collection(
                 name=Config.COLLECTION_NAME,
-                metadata={"description": "Lumina RAG document collection"}
+                metadata={
+                    "description": "Lumina RAG document collection",
+                    # HNSW tuning — cosine distance matches the normalized
+                    # embeddings; higher M/ef trade memory for recall
+                    "hnsw:space": Config.HNSW_SPACE,
+                    "hnsw:M": Config.HNSW_M,
+                    "hnsw:construction_ef": Config.HNSW_CONSTRUCTION_EF,
+                    "hnsw:search_ef": Config.HNSW_SEARCH_EF
+                }
             )
             print(f"✓ Created new collection: {Config.COLLECTION_NAME}")
         return collection
@@ -87,39 +141,78 @@ class RAGEngine:
         
         if len(text) <= chunk_size:
             return [text]
-        
+
+        # One linear scan collects every sentence boundary up front; each
+        # window then finds its break point with a bisect instead of five
+        # rfind passes over a fresh substring copy
+        boundaries = [m.end() for m in _SENTENCE_BOUNDARY_RE.finditer(text)]
+
+        text_length = len(text)
         chunks = []
         start = 0
-        
-        while start < len(text):
+
+        while start < text_length:
             end = start + chunk_size
-            
-            # If not at the end, try to break at sentence boundary
-            if end < len(text):
-                # Look for sentence endings
-                for sep in ['. ', '.\n', '! ', '?\n', '? ']:
-                    last_sep = text[start:end].rfind(sep)
-                    if last_sep != -1:
-                        end = start + last_sep + len(sep)
-                        break
-            
+
+            # If not at the end, try to break at the last sentence boundary
+            # inside the window (but far enough in to guarantee progress)
+            if end < text_length:
+                idx = bisect.bisect_right(boundaries, end) - 1
+                if idx >= 0 and boundaries[idx] > start + overlap:
+                    end = boundaries[idx]
+
             chunk = text[start:end].strip()
             if chunk:
                 chunks.append(chunk)
-            
-            start = end - overlap if end < len(text) else end
-        
+
+            start = end - overlap if end < text_length else end
+
         return chunks
     
+    @staticmethod
+    def _normalize_query(query):
+        """Normalize a query for cache keying (casefold + collapse whitespace)"""
+        return " ".join(query.casefold().split())
+
+    def _cache_get(self, cache, key):
+        """LRU lookup: move hit to the end so it survives eviction longest"""
+        with self._cache_lock:
+            if key in cache:
+                cache.move_to_end(key)
+                return cache[key]
+        return None
+
+    def _cache_put(self, cache, key, value, max_size):
+        """LRU insert with eviction of the oldest entry"""
+        with self._cache_lock:
+            cache[key] = value
+            cache.move_to_end(key)
+            while len(cache) > max_size:
+                cache.popitem(last=False)
+
+    def _invalidate_caches(self):
+        """Invalidate cached search results and document listings after any
+        write — the version bump orphans every existing search key"""
+        with self._cache_lock:
+            self._index_version += 1
+            self._documents_cache.clear()
+
     def generate_embeddings(self, texts, batch_size=64):
         """Generate embeddings using GPU-accelerated batched encoding.
         
         batch_size=64 is optimal for GPU VRAM (all-MiniLM-L6-v2 is tiny).
         Falls back gracefully on CPU with batch_size=16 to avoid OOM.
         """
+        single_query = None
         if isinstance(texts, str):
+            # Single-string calls are query embeddings — cache them so
+            # repeated searches skip the encoder entirely
+            single_query = self._normalize_query(texts)
+            cached = self._cache_get(self._embedding_cache, single_query)
+            if cached is not None:
+                return cached
             texts = [texts]
-        
+
         # Reduce batch size automatically on CPU to control memory
         device = getattr(self, '_embedding_device', 'cpu')
         if device == 'cpu':
@@ -132,76 +225,139 @@ class RAGEngine:
             convert_to_numpy=True,
             normalize_embeddings=True           # L2-normalize — improves cosine sim accuracy
         )
-        
-        return all_embeddings.tolist()
+
+        # Keep embeddings as a compact float32 ndarray — a list of Python
+        # floats is ~8x larger and is only needed at the ChromaDB boundary
+        embeddings = np.asarray(all_embeddings, dtype=np.float32)
+
+        if single_query is not None:
+            self._cache_put(self._embedding_cache, single_query, embeddings,
+                            Config.EMBEDDING_CACHE_SIZE)
+
+        return embeddings
     
     def add_document(self, filename, text, metadata=None, session_id=None):
         """
         Add a document to the vector database
-        
+
         Args:
             filename: Name of the source file
             text: Extracted text from document
             metadata: Additional metadata (dict)
             session_id: Session ID for isolation (optional)
-        
+
         Returns:
             Number of chunks added
         """
-        # Chunk the text
-        chunks = self.chunk_text(text)
-        
-        if not chunks:
-            print(f"No chunks generated for {filename}")
-            return 0
-        
-        # Apply safety cap to prevent runaway processing on huge documents
+        return self.add_documents_bulk([(filename, text, metadata)],
+                                       session_id=session_id)[0]
+
+    def add_documents_bulk(self, files, session_id=None):
+        """
+        Add several documents in one pass: all chunks from all files go
+        through a single embedding encode and bounded ChromaDB inserts,
+        amortizing GPU launch and database write overhead across files.
+
+        Args:
+            files: List of (filename, text, metadata) tuples
+            session_id: Session ID for isolation (optional)
+
+        Returns:
+            List of chunk counts, one per file (same order)
+        """
+        counts = [0] * len(files)
+        all_chunks = []
+        all_ids = []
+        all_metadatas = []
         max_chunks = getattr(Config, 'MAX_CHUNKS_PER_DOC', None)
-        if max_chunks and len(chunks) > max_chunks:
-            print(f"⚠️  Document has {len(chunks)} chunks — capping at {max_chunks} for {filename}")
-            chunks = chunks[:max_chunks]
-        
-        print(f"Generated {len(chunks)} chunks from {filename}")
-        
-        # Generate embeddings in small batches to avoid memory spikes
-        embeddings = self.generate_embeddings(chunks)
-        
-        # Prepare metadata
-        base_metadata = {
-            "filename": filename,
-            "timestamp": datetime.now().isoformat(),
-            "total_chunks": len(chunks)
-        }
-        
-        # Add session_id to metadata for isolation
-        if session_id:
-            base_metadata["session_id"] = str(session_id)
-        
-        if metadata:
-            base_metadata.update(metadata)
-        
-        # Generate unique IDs
-        doc_id = str(uuid.uuid4())
-        ids = [f"{doc_id}_chunk_{i}" for i in range(len(chunks))]
-        
-        # Prepare metadata for each chunk
-        metadatas = []
-        for i in range(len(chunks)):
-            chunk_meta = base_metadata.copy()
-            chunk_meta["chunk_index"] = i
-            chunk_meta["doc_id"] = doc_id
-            metadatas.append(chunk_meta)
-        
-        # Add to collection
-        self.collection.add(
-            ids=ids,
-            embeddings=embeddings,
-            documents=chunks,
-            metadatas=metadatas
-        )
-        
-        print(f"✓ Added {len(chunks)} chunks to vector database (session: {session_id or 'global'})")
-        return len(chunks)
+
+        for file_index, (filename, text, metadata) in enumerate(files):
+            # Dedup: if this exact content is already indexed (in the same
+            # session scope), skip re-chunking and re-embedding entirely
+            content_hash = hashlib.sha256(text.encode('utf-8', errors='ignore')).hexdigest()
+            try:
+                if session_id:
+                    dedup_filter = {"$and": [{"content_hash": content_hash},
+                                             {"session_id": str(session_id)}]}
+                else:
+                    dedup_filter = {"content_hash": content_hash}
+                existing = self.collection.get(where=dedup_filter, limit=1)
+                if existing and existing['ids']:
+                    existing_meta = existing['metadatas'][0]
+                    print(f"♻️  {filename} already indexed as "
+                          f"'{existing_meta.get('filename')}' — skipping re-embedding")
+                    counts[file_index] = existing_meta.get('total_chunks', 0)
+                    continue
+            except Exception as e:
+                print(f"⚠️ Dedup check failed ({e}) — indexing anyway")
+
+            # Chunk the text
+            chunks = self.chunk_text(text)
+
+            if not chunks:
+                print(f"No chunks generated for {filename}")
+                continue
+
+            # Apply safety cap to prevent runaway processing on huge documents
+            if max_chunks and len(chunks) > max_chunks:
+                print(f"⚠️  Document has {len(chunks)} chunks — capping at {max_chunks} for {filename}")
+                chunks = chunks[:max_chunks]
+
+            print(f"Generated {len(chunks)} chunks from {filename}")
+            counts[file_index] = len(chunks)
+
+            # Prepare metadata
+            base_metadata = {
+                "filename": filename,
+                "timestamp": datetime.now().isoformat(),
+                "total_chunks": len(chunks),
+                "content_hash": content_hash
+            }
+
+            # Add session_id to metadata for isolation
+            if session_id:
+                base_metadata["session_id"] = str(session_id)
+
+            if metadata:
+                base_metadata.update(metadata)
+
+            # Generate unique IDs — one RNG call per document, then plain
+            # concatenation off a preformatted prefix per chunk
+            doc_id = uuid.uuid4().hex
+            id_prefix = doc_id + "_chunk_"
+            all_chunks.extend(chunks)
+            all_ids.extend(id_prefix + str(i) for i in range(len(chunks)))
+            # Single-expression dict build: the {**base, ...} form constructs
+            # each chunk's metadata in one bytecode op instead of copy() plus
+            # two item assignments
+            all_metadatas.extend(
+                {**base_metadata, "chunk_index": i, "doc_id": doc_id}
+                for i in range(len(chunks))
+            )
+
+        if not all_chunks:
+            return counts
+
+        # One encode over every chunk from every file
+        embeddings = self.generate_embeddings(all_chunks)
+
+        # Add to collection in bounded batches — one insert call per slice
+        # keeps memory flat on large documents while avoiding per-chunk calls
+        insert_batch = getattr(Config, 'CHROMA_INSERT_BATCH', 256)
+        for start in range(0, len(all_chunks), insert_batch):
+            end = start + insert_batch
+            self.collection.add(
+                ids=all_ids[start:end],
+                embeddings=embeddings[start:end].tolist(),
+                documents=all_chunks[start:end],
+                metadatas=all_metadatas[start:end]
+            )
+
+        self._invalidate_caches()
+
+        print(f"✓ Added {len(all_chunks)} chunks from {len(files)} file(s) "
+              f"to vector database (session: {session_id or 'global'})")
+        return counts
     
     def semantic_search(self, query, top_k=None, filter_metadata=None, session_id=None):
         """
@@ -217,7 +373,26 @@ class RAGEngine:
             List of results with documents, metadata, and distances
         """
         top_k = top_k or Config.TOP_K_RETRIEVAL
-        
+
+        # Check the result cache — identical searches (normalized) skip
+        # both the encoder and the vector database. Metadata filters join
+        # the key in canonical JSON form; the index version orphans stale
+        # entries after any write
+        filter_key = None
+        if filter_metadata is not None:
+            try:
+                filter_key = json.dumps(filter_metadata, sort_keys=True)
+            except (TypeError, ValueError):
+                filter_key = None
+        cache_key = None
+        if filter_metadata is None or filter_key is not None:
+            cache_key = (self._normalize_query(query), top_k,
+                         str(session_id) if session_id else None,
+                         filter_key, self._index_version)
+            cached = self._cache_get(self._search_cache, cache_key)
+            if cached is not None:
+                return cached
+
         # Generate query embedding
         query_embedding = self.generate_embeddings(query)
         
@@ -229,7 +404,7 @@ class RAGEngine:
         # Search
         try:
             results = self.collection.query(
-                query_embeddings=query_embedding,
+                query_embeddings=query_embedding.tolist(),
                 n_results=top_k,
                 where=where_filter
             )
@@ -238,24 +413,130 @@ class RAGEngine:
             print(f"⚠️ Search error (possibly no docs for session): {e}")
             return []
         
-        # Format results
-        formatted_results = []
-        if results and results['ids'] and len(results['ids']) > 0:
-            for i in range(len(results['ids'][0])):
-                result = {
-                    'id': results['ids'][0][i],
-                    'document': results['documents'][0][i],
-                    'metadata': results['metadatas'][0][i],
-                    'distance': results['distances'][0][i] if 'distances' in results else None,
-                    'similarity': 1 - results['distances'][0][i] if 'distances' in results else None
-                }
-                
-                # Filter by similarity threshold
-                if result['similarity'] and result['similarity'] >= Config.SIMILARITY_THRESHOLD:
-                    formatted_results.append(result)
-        
+        formatted_results = self._format_query_results(results, 0)
+
+        if cache_key is not None:
+            self._cache_put(self._search_cache, cache_key, formatted_results,
+                            Config.SEARCH_CACHE_SIZE)
+
         return formatted_results
-    
+
+    @staticmethod
+    def _format_query_results(results, query_index):
+        """Format one query's slice of a ChromaDB query response,
+        applying the similarity threshold"""
+        if not results or not results['ids'] or len(results['ids']) <= query_index:
+            return []
+
+        has_distances = 'distances' in results and results['distances']
+        if not has_distances:
+            # Without distances there is no similarity to pass the threshold
+            return []
+
+        ids = results['ids'][query_index]
+        documents = results['documents'][query_index]
+        metadatas = results['metadatas'][query_index]
+        distances = results['distances'][query_index]
+
+        # Vectorized similarity + threshold: one array op instead of a
+        # Python comparison per result
+        similarities = 1.0 - np.asarray(distances, dtype=np.float64)
+        keep = np.nonzero(similarities >= Config.SIMILARITY_THRESHOLD)[0]
+
+        return [
+            {
+                'id': ids[i],
+                'document': documents[i],
+                'metadata': metadatas[i],
+                'distance': distances[i],
+                'similarity': float(similarities[i])
+            }
+            for i in keep
+        ]
+
+    def semantic_search_batch(self, queries, top_k=None, session_id=None):
+        """
+        Search for multiple queries in a single embedding encode + single
+        ChromaDB query call. Used by the retrieval batcher to coalesce
+        concurrent requests.
+
+        Args:
+            queries: List of search queries
+            top_k: Number of results per query
+            session_id: Session ID for isolation (optional)
+
+        Returns:
+            List of result lists, one per query (same order)
+        """
+        if not queries:
+            return []
+
+        top_k = top_k or Config.TOP_K_RETRIEVAL
+        session_key = str(session_id) if session_id else None
+
+        # Serve per-query hits from the search cache first — the retrieval
+        # batcher funnels every endpoint search through this path, so the
+        # cache has to be consulted here, not only in semantic_search.
+        # Keys mirror semantic_search's (this path has no metadata filter)
+        out = [None] * len(queries)
+        cache_keys = []
+        miss_indices = []
+        for qi, query in enumerate(queries):
+            cache_key = (self._normalize_query(query), top_k, session_key,
+                         None, self._index_version)
+            cache_keys.append(cache_key)
+            cached = self._cache_get(self._search_cache, cache_key)
+            if cached is not None:
+                out[qi] = cached
+            else:
+                miss_indices.append(qi)
+
+        if not miss_indices:
+            return out
+
+        # Embedding cache per miss; one batched GPU encode covers the rest
+        miss_embeddings = [None] * len(miss_indices)
+        encode_texts = []
+        encode_positions = []
+        for pos, qi in enumerate(miss_indices):
+            cached_emb = self._cache_get(self._embedding_cache, cache_keys[qi][0])
+            if cached_emb is not None:
+                miss_embeddings[pos] = cached_emb
+            else:
+                encode_texts.append(queries[qi])
+                encode_positions.append(pos)
+        if encode_texts:
+            encoded = self.generate_embeddings(encode_texts)
+            for row, pos in enumerate(encode_positions):
+                embedding = encoded[row:row + 1]
+                miss_embeddings[pos] = embedding
+                self._cache_put(self._embedding_cache,
+                                cache_keys[miss_indices[pos]][0], embedding,
+                                Config.EMBEDDING_CACHE_SIZE)
+
+        where_filter = {"session_id": session_key} if session_id else None
+
+        try:
+            results = self.collection.query(
+                query_embeddings=np.vstack(miss_embeddings).tolist(),
+                n_results=top_k,
+                where=where_filter
+            )
+        except Exception as e:
+            print(f"⚠️ Batched search error (possibly no docs for session): {e}")
+            for qi in miss_indices:
+                out[qi] = []
+            return out
+
+        for pos, qi in enumerate(miss_indices):
+            formatted = self._format_query_results(results, pos)
+            out[qi] = formatted
+            self._cache_put(self._search_cache, cache_keys[qi], formatted,
+                            Config.SEARCH_CACHE_SIZE)
+
+        return out
+
+
     def get_chunks_by_filename(self, filename, session_id=None, max_chunks=500):
         """
         Retrieve all chunks for a specific file by its filename.
@@ -316,8 +597,9 @@ class RAGEngine:
             results = self.collection.get(where=where_filter)
             if results and results['ids']:
                 self.collection.delete(ids=results['ids'])
+                self._invalidate_caches()
                 return len(results['ids'])
-        
+
         if filename:
             # Delete by filename (optionally scoped to session)
             if session_id:
@@ -327,17 +609,29 @@ class RAGEngine:
             results = self.collection.get(where=where_filter)
             if results and results['ids']:
                 self.collection.delete(ids=results['ids'])
+                self._invalidate_caches()
                 return len(results['ids'])
-        
+
         return 0
     
     def get_all_documents(self, session_id=None):
         """Get list of all unique documents, optionally filtered by session"""
+        # /health and /api/documents hit this on every poll — serve the
+        # cached listing unless the collection changed since
+        session_key = str(session_id) if session_id else None
+        with self._cache_lock:
+            cached = self._documents_cache.get(session_key)
+        if cached is not None:
+            return cached
+
         try:
+            # Project metadatas only — the default get() also materializes
+            # every chunk's full text, which this listing never looks at
             if session_id:
-                all_data = self.collection.get(where={"session_id": str(session_id)})
+                all_data = self.collection.get(where={"session_id": str(session_id)},
+                                               include=["metadatas"])
             else:
-                all_data = self.collection.get()
+                all_data = self.collection.get(include=["metadatas"])
         except Exception:
             return []
         
@@ -356,8 +650,13 @@ class RAGEngine:
                     'total_chunks': metadata.get('total_chunks', 0),
                     'session_id': metadata.get('session_id')
                 }
-        
-        return list(docs.values())
+
+        documents = list(docs.values())
+
+        with self._cache_lock:
+            self._documents_cache[session_key] = documents
+
+        return documents
     
     def get_stats(self):
         """Get RAG engine statistics"""
@@ -3,12 +3,93 @@ Web Search Module
 Integrates with Tavily API for live web search capabilities
 """
 
+import asyncio
+import io
 import os
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional
-import traceback
+import logging
 from config import Config
 
+# Module logger with lazy %s formatting — message construction is skipped
+# when the level is disabled, and emission doesn't contend on stdout the
+# way print() does under a concurrent fan-out
+logger = logging.getLogger(__name__)
+
+# orjson decodes the sizable advanced-search payload (several KB of result
+# content per response) a few times faster than stdlib json; fall back
+# silently when it is not installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Circuit breaker tuning: trip after this many consecutive network
+# failures and fast-fail searches for the cooldown period
+_BREAKER_THRESHOLD = 3
+_BREAKER_COOLDOWN = 30.0  # seconds
+
+
+def _truncate(text: str, limit: int) -> str:
+    """Cap text at limit chars with an ellipsis marker when cut"""
+    if len(text) > limit:
+        return text[:limit] + '…'
+    return text
+
+
+def _canon_url(url: Optional[str]) -> Optional[str]:
+    """Canonicalize a URL for dedup: lowercase scheme/host, drop fragments,
+    tracking params and trailing slashes so syndicated copies compare equal"""
+    if not url:
+        return None
+    try:
+        parts = urlsplit(url)
+        query = urlencode([
+            (key, value) for key, value in parse_qsl(parts.query)
+            if not key.lower().startswith('utm_')
+        ])
+        return urlunsplit((
+            parts.scheme.lower(),
+            parts.netloc.lower(),
+            parts.path.rstrip('/'),
+            query,
+            ''
+        ))
+    except ValueError:
+        return url
+
+# Optional async HTTP stack — sync requests path is the fallback
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+
+# Optional HTTP/2 transport: concurrent Tavily calls multiplex over one TLS
+# connection instead of opening one per in-flight request
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+if HTTPX_AVAILABLE:
+    _TIMEOUT_ERRORS = (requests.exceptions.Timeout, httpx.TimeoutException)
+    _REQUEST_ERRORS = (requests.exceptions.RequestException, httpx.HTTPError)
+else:
+    _TIMEOUT_ERRORS = (requests.exceptions.Timeout,)
+    _REQUEST_ERRORS = (requests.exceptions.RequestException,)
+
 
 class WebSearch:
     """Handles web search using Tavily API"""
@@ -20,11 +101,155 @@ class WebSearch:
         
         # Tavily API endpoint
         self.tavily_url = "https://api.tavily.com/search"
-    
+
+        # Lazily created aiohttp sessions for the async search paths, keyed
+        # by event loop — a session is only usable on the loop it was
+        # created in, and the sync wrappers spin up a fresh loop per call
+        self._aio_sessions = {}
+
+        # LRU of recent results keyed on the normalized query — a repeated
+        # question within the TTL skips the API round-trip (and its quota)
+        self._result_cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+        # Circuit breaker: when Tavily is down, waiting out the full
+        # timeout on every call multiplies the outage across the pipeline.
+        # After a few consecutive failures searches fast-fail instead.
+        self._breaker_lock = threading.Lock()
+        self._consecutive_failures = 0
+        self._breaker_opened_at = 0.0
+
+        # Persistent session: reuses the TCP+TLS connection across searches
+        # instead of paying the handshake on every request. The adapter
+        # sizes the keep-alive pool for concurrent fan-out and retries
+        # transient Tavily errors with a short backoff.
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(
+            pool_connections=10,
+            pool_maxsize=20,
+            max_retries=Retry(
+                total=2,
+                backoff_factor=0.2,
+                status_forcelist=[429, 500, 502, 503, 504],
+                allowed_methods=["POST"]
+            )
+        ))
+
+        # Prefer an HTTP/2 client when httpx (+h2) is installed: concurrent
+        # searches from the thread fan-out share a single multiplexed
+        # connection. Falls back to the requests session above.
+        self._httpx_client = None
+        if HTTPX_AVAILABLE and Config.WEB_SEARCH_HTTP2:
+            try:
+                self._httpx_client = httpx.Client(
+                    http2=True,
+                    limits=httpx.Limits(max_connections=100,
+                                        max_keepalive_connections=20),
+                    timeout=httpx.Timeout(10.0)
+                )
+                logger.info("✓ Web search using HTTP/2 transport")
+            except ImportError:
+                # httpx present but the h2 extra is not installed
+                self._httpx_client = None
+
+    def close(self):
+        """Release the pooled connections"""
+        self.session.close()
+        if self._httpx_client is not None:
+            self._httpx_client.close()
+
     def is_available(self) -> bool:
         """Check if web search is available (API key configured)"""
         return bool(self.api_key and self.api_key.strip())
-    
+
+    def _cache_key(self, query: str, max_results: Optional[int]):
+        """Normalized cache key — casing/whitespace variants share an entry"""
+        return (query.strip().lower(), max_results or self.max_results)
+
+    def _cache_get(self, key) -> Optional[List[Dict]]:
+        """Return cached results for key if present and fresh, else None"""
+        with self._cache_lock:
+            entry = self._result_cache.get(key)
+            if entry is None:
+                return None
+            timestamp, results = entry
+            if time.monotonic() - timestamp > Config.WEB_SEARCH_CACHE_TTL:
+                del self._result_cache[key]
+                return None
+            self._result_cache.move_to_end(key)
+            return results
+
+    def _cache_put(self, key, results: List[Dict]):
+        """Store results for key, evicting the least recently used entry"""
+        with self._cache_lock:
+            self._result_cache[key] = (time.monotonic(), results)
+            self._result_cache.move_to_end(key)
+            while len(self._result_cache) > Config.WEB_SEARCH_CACHE_SIZE:
+                self._result_cache.popitem(last=False)
+
+    def _breaker_allows(self) -> bool:
+        """False while the breaker is open (API assumed down)"""
+        with self._breaker_lock:
+            if not self._breaker_opened_at:
+                return True
+            if time.monotonic() - self._breaker_opened_at >= _BREAKER_COOLDOWN:
+                # Half-open: let one probe through — success resets the
+                # breaker, one more failure re-opens it immediately
+                self._breaker_opened_at = 0.0
+                self._consecutive_failures = _BREAKER_THRESHOLD - 1
+                return True
+            return False
+
+    def _breaker_record(self, success: bool):
+        """Track consecutive network failures; trip the breaker at the threshold"""
+        with self._breaker_lock:
+            if success:
+                self._consecutive_failures = 0
+                self._breaker_opened_at = 0.0
+            else:
+                self._consecutive_failures += 1
+                if self._consecutive_failures >= _BREAKER_THRESHOLD:
+                    self._breaker_opened_at = time.monotonic()
+                    logger.warning("⛔ Web search circuit breaker opened for %.0fs",
+                                   _BREAKER_COOLDOWN)
+
+    def _build_payload(self, query: str, max_results: Optional[int] = None) -> Dict:
+        """Build the Tavily request payload"""
+        return {
+            "api_key": self.api_key,
+            "query": query,
+            "max_results": max_results or self.max_results,
+            "search_depth": "advanced",  # Use advanced search for better results
+            "include_answer": True,  # Get AI-generated answer summary
+            "include_raw_content": False,  # Don't need full HTML
+            "include_images": False
+        }
+
+    @staticmethod
+    def _parse_results(data: Dict) -> List[Dict]:
+        """Extract the result list (and AI answer, if any) from a Tavily response"""
+        results = []
+        for result in data.get('results', []):
+            results.append({
+                'url': result.get('url'),
+                'title': result.get('title'),
+                'content': result.get('content'),
+                'score': result.get('score', 0)
+            })
+
+        # Add AI answer if available
+        ai_answer = data.get('answer')
+        if ai_answer:
+            results.insert(0, {
+                'url': None,
+                'title': 'AI Summary',
+                'content': ai_answer,
+                'score': 1.0,
+                'is_summary': True
+            })
+        return results
+
+
     def search_web(self, query: str, max_results: Optional[int] = None) -> List[Dict]:
         """
         Search the web using Tavily API
@@ -37,142 +262,323 @@ class WebSearch:
             List of search result dicts with url, title, content, score
         """
         if not self.is_available():
-            print("⚠️ Web search API key not configured")
+            logger.warning("⚠️ Web search API key not configured")
             return []
         
+        cache_key = self._cache_key(query, max_results)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            logger.info("✓ Web search cache hit for: '%s'", query)
+            return cached
+
+        if not self._breaker_allows():
+            logger.warning("⛔ Web search circuit breaker open — skipping '%s'", query)
+            return []
+
         try:
-            max_results = max_results or self.max_results
-            
-            # Prepare request
-            payload = {
-                "api_key": self.api_key,
-                "query": query,
-                "max_results": max_results,
-                "search_depth": "advanced",  # Use advanced search for better results
-                "include_answer": True,  # Get AI-generated answer summary
-                "include_raw_content": False,  # Don't need full HTML
-                "include_images": False
+            payload = self._build_payload(query, max_results)
+
+            logger.info("🔍 Searching web for: '%s'", query)
+
+            # Make request on the HTTP/2 client or the pooled session,
+            # serializing with orjson when available
+            if orjson is not None:
+                body = orjson.dumps(payload)
+                if self._httpx_client is not None:
+                    response = self._httpx_client.post(
+                        self.tavily_url, content=body, headers=_JSON_HEADERS
+                    )
+                else:
+                    response = self.session.post(
+                        self.tavily_url, data=body, headers=_JSON_HEADERS,
+                        timeout=10
+                    )
+                response.raise_for_status()
+                data = orjson.loads(response.content)
+            else:
+                if self._httpx_client is not None:
+                    response = self._httpx_client.post(self.tavily_url, json=payload)
+                else:
+                    response = self.session.post(
+                        self.tavily_url,
+                        json=payload,
+                        timeout=10
+                    )
+                response.raise_for_status()
+                data = response.json()
+
+            results = self._parse_results(data)
+
+            self._breaker_record(success=True)
+            self._cache_put(cache_key, results)
+            logger.info("✓ Found %d web results", len(results))
+            return results
+
+        except _TIMEOUT_ERRORS:
+            self._breaker_record(success=False)
+            logger.warning("❌ Web search request timed out")
+            return []
+        except _REQUEST_ERRORS as e:
+            self._breaker_record(success=False)
+            # Expected transient failure — formatting the full traceback
+            # costs a frame walk per occurrence, so only do it under DEBUG
+            logger.warning("❌ Web search API error: %s", e,
+                           exc_info=logger.isEnabledFor(logging.DEBUG))
+            return []
+        except Exception as e:
+            logger.error("❌ Unexpected error in web search: %s", e, exc_info=True)
+            return []
+
+    async def _get_aio_session(self):
+        """Return the aiohttp session bound to the running loop, creating it
+        lazily. Sessions from other (possibly closed) loops are never reused
+        — posting on one raises 'attached to a different loop'."""
+        loop = asyncio.get_running_loop()
+        session = self._aio_sessions.get(loop)
+        if session is None or session.closed:
+            # Drop entries whose loop is gone so the map can't grow unbounded
+            self._aio_sessions = {
+                l: s for l, s in self._aio_sessions.items()
+                if not s.closed and not l.is_closed()
             }
-            
-            print(f"🔍 Searching web for: '{query}'")
-            
-            # Make request
-            response = requests.post(
-                self.tavily_url,
-                json=payload,
-                timeout=10
+            session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=100, limit_per_host=20, ttl_dns_cache=300
+                ),
+                timeout=aiohttp.ClientTimeout(total=10)
             )
-            
-            response.raise_for_status()
-            data = response.json()
-            
-            # Extract results
-            results = []
-            for result in data.get('results', []):
-                results.append({
-                    'url': result.get('url'),
-                    'title': result.get('title'),
-                    'content': result.get('content'),
-                    'score': result.get('score', 0)
-                })
-            
-            # Add AI answer if available
-            ai_answer = data.get('answer')
-            if ai_answer:
-                results.insert(0, {
-                    'url': None,
-                    'title': 'AI Summary',
-                    'content': ai_answer,
-                    'score': 1.0,
-                    'is_summary': True
-                })
-            
-            print(f"✓ Found {len(results)} web results")
+            self._aio_sessions[loop] = session
+        return session
+
+    async def asearch_web(self, query: str, max_results: Optional[int] = None) -> List[Dict]:
+        """
+        Async variant of search_web. With aiohttp installed the request runs
+        on the event loop, so callers can fan out many queries concurrently.
+
+        Args:
+            query: Search query
+            max_results: Maximum number of results (defaults to config value)
+
+        Returns:
+            List of search result dicts with url, title, content, score
+        """
+        if not self.is_available():
+            logger.warning("⚠️ Web search API key not configured")
+            return []
+
+        if not AIOHTTP_AVAILABLE:
+            # Fallback: run the blocking sync path on the default thread
+            # pool — the socket wait releases the GIL, so the event loop
+            # keeps serving other coroutines for the duration
+            return await asyncio.to_thread(self.search_web, query, max_results)
+
+        cache_key = self._cache_key(query, max_results)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            logger.info("✓ Web search cache hit for: '%s'", query)
+            return cached
+
+        if not self._breaker_allows():
+            logger.warning("⛔ Web search circuit breaker open — skipping '%s'", query)
+            return []
+
+        try:
+            payload = self._build_payload(query, max_results)
+
+            logger.info("🔍 Searching web for: '%s'", query)
+
+            session = await self._get_aio_session()
+            if orjson is not None:
+                async with session.post(self.tavily_url, data=orjson.dumps(payload),
+                                        headers=_JSON_HEADERS) as response:
+                    response.raise_for_status()
+                    data = orjson.loads(await response.read())
+            else:
+                async with session.post(self.tavily_url, json=payload) as response:
+                    response.raise_for_status()
+                    data = await response.json()
+
+            results = self._parse_results(data)
+            self._breaker_record(success=True)
+            self._cache_put(cache_key, results)
+            logger.info("✓ Found %d web results", len(results))
             return results
-            
-        except requests.exceptions.Timeout:
-            print("❌ Web search request timed out")
+
+        except asyncio.TimeoutError:
+            self._breaker_record(success=False)
+            logger.warning("❌ Web search request timed out")
             return []
-        except requests.exceptions.RequestException as e:
-            print(f"❌ Web search API error: {str(e)}")
-            traceback.print_exc()
+        except aiohttp.ClientError as e:
+            self._breaker_record(success=False)
+            logger.warning("❌ Web search API error: %s", e,
+                           exc_info=logger.isEnabledFor(logging.DEBUG))
             return []
         except Exception as e:
-            print(f"❌ Unexpected error in web search: {str(e)}")
-            traceback.print_exc()
+            logger.error("❌ Unexpected error in web search: %s", e, exc_info=True)
             return []
-    
-    def format_results_for_context(self, results: List[Dict]) -> str:
+
+    async def asearch_many(self, queries: List[str], max_results: Optional[int] = None) -> List[List[Dict]]:
         """
-        Format search results into context string for LLM
-        
+        Issue several searches concurrently on the event loop — wall time is
+        one round-trip instead of one per query.
+
+        Returns:
+            List of result lists, one per query (same order); failures
+            come back as empty lists
+        """
+        if not queries:
+            return []
+
+        # Bound the fan-out so a large batch doesn't trip Tavily's rate limit
+        semaphore = asyncio.Semaphore(8)
+
+        async def bounded_search(query):
+            async with semaphore:
+                return await self.asearch_web(query, max_results)
+
+        results = await asyncio.gather(
+            *(bounded_search(query) for query in queries),
+            return_exceptions=True
+        )
+        return [[] if isinstance(r, BaseException) else r for r in results]
+
+    async def aclose(self):
+        """Close the aiohttp session bound to the current loop (the sync
+        pool is closed via close())"""
+        session = self._aio_sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None and not session.closed:
+            await session.close()
+
+    def search_web_many(self, queries: List[str], max_results: Optional[int] = None) -> List[List[Dict]]:
+        """
+        Run several web searches concurrently over the pooled session.
+
         Args:
-            results: List of search result dicts
-            
+            queries: List of search queries
+            max_results: Maximum number of results per query
+
         Returns:
-            Formatted context string
+            List of result lists, one per query (same order)
         """
-        if not results:
-            return ""
-        
-        context_parts = []
-        context_parts.append("=== WEB SEARCH RESULTS ===\n")
-        
-        for idx, result in enumerate(results, 1):
-            if result.get('is_summary'):
-                context_parts.append(f"AI Summary:\n{result['content']}\n")
-            else:
-                title = result.get('title', 'Untitled')
-                content = result.get('content', '')
-                url = result.get('url', '')
-                
-                context_parts.append(f"{idx}. {title}")
-                if url:
-                    context_parts.append(f"   URL: {url}")
-                context_parts.append(f"   {content}\n")
-        
-        context_parts.append("=== END WEB SEARCH RESULTS ===\n")
-        
-        return "\n".join(context_parts)
+        if not queries:
+            return []
 
+        if len(queries) == 1:
+            return [self.search_web(queries[0], max_results)]
 
-def synthesize_web_results(query: str, web_results: List[Dict], rag_results: List[Dict], model_manager) -> str:
+        # Deduplicate before dispatch — decomposed sub-queries often repeat,
+        # and duplicates can share one fetch (and one cache entry)
+        normalized = [query.strip().lower() for query in queries]
+        unique = {}
+        for norm, query in zip(normalized, queries):
+            if norm not in unique:
+                unique[norm] = query
+        unique_queries = list(unique.values())
+
+        if AIOHTTP_AVAILABLE:
+            # Event-loop fan-out: all unique queries in flight at once.
+            # The loop is torn down when asyncio.run returns, so the
+            # session bound to it must be closed before that happens.
+            async def _batch():
+                try:
+                    return await self.asearch_many(unique_queries, max_results)
+                finally:
+                    await self.aclose()
+
+            unique_results = asyncio.run(_batch())
+        else:
+            with ThreadPoolExecutor(max_workers=min(len(unique_queries), 4)) as executor:
+                futures = [
+                    executor.submit(self.search_web, query, max_results)
+                    for query in unique_queries
+                ]
+                unique_results = [future.result() for future in futures]
+
+        by_norm = dict(zip(unique.keys(), unique_results))
+        return [by_norm[norm] for norm in normalized]
+
+    def format_results_for_context(self, results: List[Dict]) -> str:
+        """Format search results into context string for LLM.
+
+        Thin wrapper kept for backward compatibility — the formatting is
+        stateless, so it lives at module scope as format_web_results.
+        """
+        return format_web_results(results)
+
+
+def format_web_results(results: List[Dict]) -> str:
     """
-    Use LLM to synthesize web search results and RAG results into comprehensive answer
-    
+    Format search results into context string for LLM
+
     Args:
-        query: User's query
-        web_results: Results from web search
-        rag_results: Results from RAG retrieval
-        model_manager: Model manager instance for generation
-        
+        results: List of search result dicts
+
     Returns:
-        Synthesized answer
+        Formatted context string
     """
-    try:
-        # Build context from both sources
-        context_parts = []
-        
-        # Add web search results
-        if web_results:
-            web_searcher = WebSearch()
-            context_parts.append(web_searcher.format_results_for_context(web_results))
-        
-        # Add RAG results
-        if rag_results:
-            context_parts.append("\n=== KNOWLEDGE BASE DOCUMENTS ===\n")
-            for idx, doc in enumerate(rag_results, 1):
-                filename = doc['metadata'].get('filename', 'Unknown')
-                content = doc['document']
-                context_parts.append(f"{idx}. From {filename}:\n{content}\n")
-            context_parts.append("=== END KNOWLEDGE BASE DOCUMENTS ===\n")
-        
-        full_context = "\n".join(context_parts)
-        
-        # Build synthesis prompt
-        prompt = f"""You are a research assistant conducting deep research. You have access to both live web search results and knowledge base documents.
+    if not results:
+        return ""
+
+    # Hoist bound methods once — the loops below pay a plain LOAD_FAST per
+    # lookup instead of re-resolving .get/.add on every result
+    _get = dict.get
+    max_web_chars = Config.WEB_RESULT_MAX_CHARS
+
+    # Drop duplicate sources before they reach the prompt — Tavily often
+    # returns the same article via several tracking-tagged URLs, and
+    # redundant snippets only burn prompt tokens
+    seen_urls = set()
+    seen_hashes = set()
+    filtered = []
+    add_url = seen_urls.add
+    add_hash = seen_hashes.add
+    keep = filtered.append
+    for result in results:
+        if _get(result, 'is_summary'):
+            keep(result)
+            continue
+        canon = _canon_url(_get(result, 'url'))
+        content_hash = hash((_get(result, 'content') or '')[:512])
+        if (canon and canon in seen_urls) or content_hash in seen_hashes:
+            continue
+        if canon:
+            add_url(canon)
+        add_hash(content_hash)
+        keep(result)
+
+    # Write into one growing buffer instead of accumulating a list of
+    # fragments that join has to rescan
+    buf = io.StringIO()
+    write = buf.write
+    write("=== WEB SEARCH RESULTS ===\n\n")
+
+    for idx, result in enumerate(filtered, 1):
+        if _get(result, 'is_summary'):
+            write(f"AI Summary:\n{result['content']}\n\n")
+        else:
+            title = _get(result, 'title', 'Untitled')
+            content = _truncate(_get(result, 'content', ''), max_web_chars)
+            url = _get(result, 'url', '')
+
+            write(f"{idx}. {title}\n")
+            if url:
+                write(f"   URL: {url}\n")
+            write(f"   {content}\n\n")
+
+    write("=== END WEB SEARCH RESULTS ===\n")
+
+    return buf.getvalue()
+
+
+# Static parts of the synthesis prompt, hoisted so they are built once.
+# The prefix is also registered in ModelManager's prompt-prefix cache, so
+# its tokenization (and KV prefill, when enabled) is reused across calls.
+SYNTHESIS_PROMPT_PREFIX = (
+    "You are a research assistant conducting deep research. "
+    "You have access to both live web search results and knowledge base documents.\n\n"
+)
 
-{full_context}
+_SYNTHESIS_PROMPT_SUFFIX = """
 
 User Query: {query}
 
@@ -186,6 +592,136 @@ Instructions:
 7. Be thorough but concise
 
 Provide your comprehensive research answer:"""
+
+
+# Module-level singleton: every caller shares one WebSearch (and therefore
+# one connection pool) instead of constructing throwaway instances
+_web_search = None
+_web_search_lock = threading.Lock()
+
+
+def get_web_search() -> WebSearch:
+    """Return the shared WebSearch instance, creating it on first use"""
+    global _web_search
+    if _web_search is None:
+        with _web_search_lock:
+            if _web_search is None:
+                _web_search = WebSearch()
+    return _web_search
+
+
+async def research(query: str, model_manager, rag_engine, web_searcher: Optional[WebSearch] = None,
+                   top_k: Optional[int] = None, session_id: Optional[str] = None) -> str:
+    """
+    Run web search and RAG retrieval concurrently, then synthesize.
+
+    Neither source depends on the other, so the pre-synthesis latency is
+    max(T_web, T_rag) instead of their sum.
+
+    Args:
+        query: User's research query
+        model_manager: Model manager instance for generation
+        rag_engine: RAG engine for knowledge-base retrieval
+        web_searcher: WebSearch to use (defaults to the shared instance)
+        top_k: Number of knowledge-base documents to retrieve
+        session_id: Optional session scope for the retrieval
+
+    Returns:
+        Synthesized answer
+    """
+    searcher = web_searcher or get_web_search()
+
+    async def _noop():
+        return []
+
+    web_task = searcher.asearch_web(query) if searcher.is_available() else _noop()
+    # Retrieval is sync (GPU encode + vector db) — run it on a worker thread
+    rag_task = asyncio.to_thread(
+        rag_engine.semantic_search, query, top_k, None, session_id
+    )
+    web_results, rag_results = await asyncio.gather(web_task, rag_task)
+
+    return synthesize_web_results(query, web_results, rag_results, model_manager)
+
+
+def research_sync(query: str, model_manager, rag_engine, web_searcher: Optional[WebSearch] = None,
+                  top_k: Optional[int] = None, session_id: Optional[str] = None) -> str:
+    """Blocking wrapper around research() for callers without an event loop"""
+    searcher = web_searcher or get_web_search()
+
+    async def _run():
+        # Close the per-loop aiohttp session before asyncio.run tears the
+        # loop down, or the next call would find an orphaned session
+        try:
+            return await research(query, model_manager, rag_engine,
+                                  web_searcher=searcher, top_k=top_k,
+                                  session_id=session_id)
+        finally:
+            await searcher.aclose()
+
+    return asyncio.run(_run())
+
+
+def synthesize_web_results(query: str, web_results: List[Dict], rag_results: List[Dict], model_manager) -> str:
+    """
+    Use LLM to synthesize web search results and RAG results into comprehensive answer
+    
+    Args:
+        query: User's query
+        web_results: Results from web search
+        rag_results: Results from RAG retrieval
+        model_manager: Model manager instance for generation
+        
+    Returns:
+        Synthesized answer
+    """
+    try:
+        web_results = list(web_results or [])
+
+        def build_context():
+            # Build context from both sources into one buffer
+            buf = io.StringIO()
+            write = buf.write
+
+            # Add web search results
+            if web_results:
+                write(format_web_results(web_results))
+
+            # Add RAG results
+            if rag_results:
+                if web_results:
+                    write("\n")
+                write("\n=== KNOWLEDGE BASE DOCUMENTS ===\n\n")
+                for idx, doc in enumerate(rag_results, 1):
+                    filename = doc['metadata'].get('filename', 'Unknown')
+                    content = _truncate(doc['document'], Config.RAG_DOC_MAX_CHARS)
+                    write(f"{idx}. From {filename}:\n{content}\n\n")
+                write("=== END KNOWLEDGE BASE DOCUMENTS ===\n")
+
+            return buf.getvalue()
+
+        # Bound the total context: drop the lowest-scored web results until
+        # it fits — long contexts slow generation and bury the query.
+        # The AI Summary entry is never pruned.
+        full_context = build_context()
+        pruned = 0
+        while len(full_context) > Config.SYNTHESIS_MAX_CONTEXT_CHARS:
+            candidates = [r for r in web_results if not r.get('is_summary')]
+            if len(candidates) <= 1:
+                break
+            web_results.remove(min(candidates, key=lambda r: r.get('score', 0)))
+            pruned += 1
+            full_context = build_context()
+        if pruned:
+            logger.info("✂️ Pruned %d low-score web results to fit the context budget", pruned)
+
+        # Build synthesis prompt: static prefix + variable context + static
+        # instruction suffix (only the query slot changes)
+        prompt = (
+            SYNTHESIS_PROMPT_PREFIX
+            + full_context
+            + _SYNTHESIS_PROMPT_SUFFIX.format(query=query)
+        )
         
         # Generate response
         response = model_manager.generate(
@@ -197,6 +733,5 @@ Provide your comprehensive research answer:"""
         return response
         
     except Exception as e:
-        print(f"❌ Error synthesizing results: {str(e)}")
-        traceback.print_exc()
+        logger.error("❌ Error synthesizing results: %s", e, exc_info=True)
         return "Error: Could not synthesize research results"